@@ -3,12 +3,14 @@ from tkinter import ttk
 from tkinter import StringVar
 import main
 from basics import *
+from pawn_structure_index import PawnStructureIndex
 from chess_board_frame import Board, WHITE_PAWN_CHARACTER, BLACK_QUEEN_CHARACTER, CHESS_FONT
 
 root = tk.Tk()
 
 pawns = {}  # dict from files to ranks. No pawn means not in dict
 queen = None  # either none, or (f,r)
+structure_index = PawnStructureIndex()  # results of all queen squares per pawns and player, filled on demand
 
 # status of the ui-board:
 player = StringVar(value="pawns")  # or value="queen
@@ -24,24 +26,24 @@ def clear_board_and_set_pieces():
 
 
 def get_main_pawns():
-    result = main.Pawns()
-    for f, r in pawns.items():
-        result.set(BOARD.get_square(f, r))
-    return result
+    return main.Pawns(*[BOARD.get_square(f, r) for f, r in pawns.items()])
 
 
 def evaluate_pawns_only_board():
     mp = get_main_pawns()
+    summary = structure_index.summary(mp, Player.WHITE if player.get() == "pawns" else Player.BLACK)
 
-    # try queen on all empty squares
+    # try queen on all empty squares, the index has the valid positions
     for qf in FILES:
         for qr in RANKS:
             mq = Queen(BOARD.get_square(qf, qr))
             if not mp.occupy(mq):
-                if player.get() == "pawns":
-                    e = main.PosWhite(mp, mq).evaluate()
-                else:
-                    e = main.PosBlack(mp, mq).evaluate()
+                e = summary.result(mq.square)
+                if e is None:
+                    if player.get() == "pawns":
+                        e = main.PosWhite(mp, mq).evaluate()
+                    else:
+                        e = main.PosBlack(mp, mq).evaluate()
 
                 if e is not None:
                     character = {Status.WIN: "+", Status.DRAW: "=", Status.LOSE: "-"}[e]
@@ -94,7 +96,7 @@ def square_pressed(file, rank):
     square = board_frame.squares[file, rank]
 
     if player.get() == "pawns":
-        if rank in (1, 8):
+        if rank in (1, PROMOTION_RANK):
             return
 
         if queen == (file, rank):
@@ -33,4 +33,5 @@ def analyse_draw():
     input("ready")
 
 
-analyse_draw()
+if __name__ == "__main__":
+    analyse_draw()
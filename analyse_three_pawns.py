@@ -1,20 +1,16 @@
 from main import *
+from pawn_structure_index import PawnStructureIndex
+
+
+structure_index = PawnStructureIndex()
 
 
 def check_pawns_win_against_queen_on_all_legal_squares(pawns):
-    for sq in BOARD.squares:
-        queen = Queen(sq)
-        if sq not in [p.square for p in pawns.squares]:
-            pos = PosWhite(pawns, queen)
-            if pos.is_valid():
-                assert pos.evaluate() == Status.WIN, pos
+    assert structure_index.pawns_win_everywhere(pawns), pawns
 
 
 def check_queen_wins_on_all_legal_squares(pawns):
-    for square in filter(lambda sq: sq not in pawns, BOARD.squares):
-        pos = PosBlack(pawns, Queen(sq))
-        if pos.is_valid():
-            assert pos.evaluate() == Status.WIN, pos
+    assert structure_index.queen_wins_everywhere(pawns), pawns
 
 
 def queen_wins_against_three_pawns_in_adjacent_files_at_rank_5_or_lower():
@@ -104,7 +100,8 @@ def try_something():
                 print(pos, pos.evaluate())
 
 
-# queen_wins_against_three_pawns_in_adjacent_files_at_rank_5_or_lower()
-# three_pawns_one_isolated()
-try_something()
-three_pawns_xxx()
+if __name__ == "__main__":
+    # queen_wins_against_three_pawns_in_adjacent_files_at_rank_5_or_lower()
+    # three_pawns_one_isolated()
+    try_something()
+    three_pawns_xxx()
@@ -125,9 +125,10 @@ def check_lower_rank_push_mandatory():
                             print(f'"{str(pos).replace(" ", ",")}",')
 
 
-queen_wins_against_two_pawns_at_most_one_at_rank_6()
-queen_loses_against_two_pawns_at_rank_7()
-queen_loses_against_defended_pawn_at_rank_7()
-queen_wins_against_two_isolated_pawns_at_rank_6()
-pawns_win_often_with_defended_pawn_at_rank_6()
-check_lower_rank_push_mandatory()
+if __name__ == "__main__":
+    queen_wins_against_two_pawns_at_most_one_at_rank_6()
+    queen_loses_against_two_pawns_at_rank_7()
+    queen_loses_against_defended_pawn_at_rank_7()
+    queen_wins_against_two_isolated_pawns_at_rank_6()
+    pawns_win_often_with_defended_pawn_at_rank_6()
+    check_lower_rank_push_mandatory()
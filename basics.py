@@ -1,9 +1,25 @@
 from enum import IntEnum, Enum, unique
 from typing import Dict, Tuple
 from copy import copy
+import os
 
-RANKS = range(1, 9)
-FILES = range(1, 9)
+
+# The board has NB_FILES files and NB_RANKS ranks: 8 x 8, unless the environment variable
+# PAWNS_VS_QUEEN_BOARD is set, e.g. PAWNS_VS_QUEEN_BOARD=5x6 for 5 files and 6 ranks (4x4 up to 10x10).
+# All modules import these names, so the size is fixed at import; see board_scaling.py for other sizes.
+def _board_size_from_environment():
+    value = os.environ.get("PAWNS_VS_QUEEN_BOARD", "8x8")
+    nb_files, nb_ranks = map(int, value.lower().split("x"))
+    assert 4 <= nb_files <= 10 and 4 <= nb_ranks <= 10, f"unsupported board size: {value}"
+    return nb_files, nb_ranks
+
+
+NB_FILES, NB_RANKS = _board_size_from_environment()
+RANKS = range(1, NB_RANKS + 1)
+FILES = range(1, NB_FILES + 1)
+PROMOTION_RANK = NB_RANKS
+# noinspection SpellCheckingInspection
+FILE_LETTERS = "abcdefghij"[:NB_FILES]
 
 
 class Player(IntEnum):
@@ -22,14 +38,14 @@ class Status(IntEnum):
 
 class Square:
     def __init__(self, file, rank):
-        assert 1 <= file <= 8
-        assert 1 <= rank <= 8
+        assert 1 <= file <= NB_FILES
+        assert 1 <= rank <= NB_RANKS
         self.__file = file
         self.__rank = rank
+        self.__index = (file - 1) + (rank - 1) * len(FILES)
 
     def __str__(self):
-        # noinspection SpellCheckingInspection
-        return "_abcdefgh"[self.file] + str(self.rank)
+        return FILE_LETTERS[self.file - 1] + str(self.rank)
 
     @property
     def file(self):
@@ -39,6 +55,11 @@ class Square:
     def rank(self):
         return self.__rank
 
+    @property
+    def index(self):
+        # a1 = 0, b1 = 1, ..., h8 = 63 on an 8 x 8 board
+        return self.__index
+
 
 @unique
 class Direction(IntEnum):
@@ -142,7 +163,7 @@ class Pawn(Piece):
         assert self.rank > 1
 
     def is_promoted(self):
-        return self.rank == 8
+        return self.rank == PROMOTION_RANK
 
     def __str__(self):
         return f"{self.square}"
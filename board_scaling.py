@@ -0,0 +1,119 @@
+from timeit import default_timer as timer
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Scaling study on smaller and larger boards.
+#
+# The board size is fixed at import (see basics.py), so each size is solved in its own process:
+# all positions with 0 up to max_pawns pawns, recording per number of pawns the time, the number of
+# positions and their W/D/L counts, and the peak memory of the process.
+#
+#     python board_scaling.py 4x4 5x5 6x6 --max-pawns 3
+#     python board_scaling.py 4x4 5x5 --max-pawns 4 --write-fixture small_boards.json
+#     python board_scaling.py 4x4 5x5 --max-pawns 4 --check-fixture small_boards.json
+#
+# A fixture holds the W/D/L counts only, so it can be used as a full-table regression check
+# for new engines and stores, finishing in seconds on small boards.
+
+ENVIRONMENT_VARIABLE = "PAWNS_VS_QUEEN_BOARD"
+
+
+def peak_memory_in_bytes():
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def solve(max_pawns):
+    # runs in the process for one board size, returns the report for that size
+    import main
+    from basics import NB_FILES, NB_RANKS, Player, Status
+
+    layers = []
+    expanded_before = 0
+    for n in range(min(max_pawns, NB_FILES) + 1):
+        start = timer()
+        main.generate_and_evaluate_all_positions_with_pawns(n)
+        seconds = timer() - start
+        counts = {}
+        for p in Player:
+            evaluations = [e for _, e in main.evaluation_store.items(p, n)]
+            counts[p.name] = {s.name: evaluations.count(s) for s in Status}
+        positions = sum(sum(c.values()) for c in counts.values())
+        expanded = sum(main.get_counters()[1::2])  # searched positions, w2 + b2, since the start
+        layers.append({"pawns": n, "seconds": seconds, "positions": positions,
+                       "expanded": expanded - expanded_before, "counts": counts})
+        expanded_before = expanded
+    return {"board": f"{NB_FILES}x{NB_RANKS}", "layers": layers, "peak_memory": peak_memory_in_bytes()}
+
+
+def run(board, max_pawns):
+    environment = dict(os.environ, **{ENVIRONMENT_VARIABLE: board})
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--solve", str(max_pawns)],
+                            env=environment, check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def print_report(report):
+    memory = report["peak_memory"]
+    print(f"Board {report['board']}" + (f", peak memory {memory / 2 ** 20:.1f} MB" if memory else ""))
+    for layer in report["layers"]:
+        per_position = 1e6 * layer["seconds"] / layer["positions"] if layer["positions"] else 0
+        print(f"    {layer['pawns']} pawns: {layer['positions']:>10} positions {layer['seconds']:8.2f}s "
+              f"({per_position:.1f} us/position)", end="")
+        for player, counts in layer["counts"].items():
+            print(f"  {player[0]}: W={counts['WIN']} D={counts['DRAW']} L={counts['LOSE']}", end="")
+        print()
+
+
+def fixture_of(reports):
+    return {r["board"]: {str(layer["pawns"]): layer["counts"] for layer in r["layers"]} for r in reports}
+
+
+def check_fixture(reports, fixture):
+    # returns the list of differences with the fixture, for the boards and pawn counts in both
+    differences = []
+    for board, layers in fixture_of(reports).items():
+        for pawns, counts in layers.items():
+            expected = fixture.get(board, {}).get(pawns, None)
+            if expected is not None and expected != counts:
+                differences.append(f"{board} with {pawns} pawns: expected {expected}, got {counts}")
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the game on several board sizes")
+    parser.add_argument("boards", nargs="*", default=["4x4", "5x5", "6x6"], help="sizes like 5x6 (files x ranks)")
+    parser.add_argument("--max-pawns", type=int, default=2)
+    parser.add_argument("--write-fixture")
+    parser.add_argument("--check-fixture")
+    parser.add_argument("--solve", type=int, help=argparse.SUPPRESS)  # used for the process of one board size
+    args = parser.parse_args()
+
+    if args.solve is not None:
+        sys.setrecursionlimit(10000)
+        print(json.dumps(solve(args.solve)))
+        sys.exit(0)
+
+    all_reports = []
+    for b in args.boards:
+        all_reports.append(run(b, args.max_pawns))
+        print_report(all_reports[-1])
+
+    if args.write_fixture:
+        with open(args.write_fixture, "w") as f:
+            json.dump(fixture_of(all_reports), f, indent=1)
+    if args.check_fixture:
+        with open(args.check_fixture) as f:
+            found = check_fixture(all_reports, json.load(f))
+        for d in found:
+            print(d)
+        print("fixture OK" if not found else f"{len(found)} differences with fixture")
+        sys.exit(1 if found else 0)
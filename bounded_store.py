@@ -0,0 +1,131 @@
+from collections import OrderedDict
+import main
+from main import PAWN_BITS, PAWN_MASK, PLAYER_SHIFT
+from evaluation_statistics import EvaluationStatistics
+from basics import *
+
+# A size-capped replacement for EvaluationStore, for on-demand evaluation with a fixed memory footprint.
+#
+# Entries are kept in least-recently-used order. When the store is full, the replacement policy selects
+# the entry to evict. Position.evaluate passes for every saved position:
+#   - work:     the number of positions expanded to evaluate it, itself included
+#               (1 if it is terminal or all its children were found in the store)
+#   - ply:      its distance to the position evaluate was called for
+#   - terminal: True if its result did not need any child (lost by definition or without moves)
+# Evicted positions are simply evaluated again when needed, so a re-insertion is not an error here.
+# The store has the statistics, items and count of EvaluationStore; statistics count every insertion,
+# so a position evaluated again after its eviction is counted again.
+#
+# Usage:
+#     use_bounded_store(1_000_000, DepthPreferredPolicy())
+#     ...
+#     main.evaluation_store.print_stats()
+
+
+class LRUPolicy:
+    # evict the least recently used entry
+    def select_victim(self, entries):
+        return next(iter(entries))
+
+
+class DepthPreferredPolicy:
+    # evict the entry with the least work among the sample_size least recently used entries
+    def __init__(self, sample_size=8):
+        self.sample_size = sample_size
+
+    def select_victim(self, entries):
+        victim = None
+        victim_work = None
+        for i, (key, (_, work, _, _, _)) in enumerate(entries.items()):
+            if i == self.sample_size:
+                break
+            if victim is None or work < victim_work:
+                victim, victim_work = key, work
+        return victim
+
+
+class KeepTerminalAndNearRootPolicy:
+    # Evict the least recently used entry that is neither terminal nor near the root
+    # (ply <= near_root_ply). Protected entries get a second chance: they are moved to the end.
+    # If the sample_size least recently used entries are all protected, the least recently used is evicted.
+    def __init__(self, near_root_ply=4, sample_size=8):
+        self.near_root_ply = near_root_ply
+        self.sample_size = sample_size
+
+    def select_victim(self, entries):
+        for _ in range(self.sample_size):
+            key = next(iter(entries))
+            _, _, ply, _, terminal = entries[key]
+            if not terminal and ply > self.near_root_ply:
+                return key
+            entries.move_to_end(key)
+        return next(iter(entries))
+
+
+POLICIES = {"lru": LRUPolicy, "depth": DepthPreferredPolicy, "terminal-and-root": KeepTerminalAndNearRootPolicy}
+
+
+class BoundedEvaluationStore:
+    def __init__(self, max_entries, policy=None):
+        assert max_entries > 0
+        self.max_entries = max_entries
+        self.policy = policy if policy is not None else LRUPolicy()
+        self.entries = OrderedDict()  # key -> (evaluation, work, ply, code, terminal), the code verifies the key
+        self.statistics = EvaluationStatistics()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self, position, evaluation, work=1, ply=0, terminal=False):
+        # a position with the same key as another one replaces it
+        assert isinstance(evaluation, Status)
+        key = position.key
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        elif len(self.entries) >= self.max_entries:
+            del self.entries[self.policy.select_victim(self.entries)]
+            self.evictions += 1
+        self.entries[key] = (evaluation, work, ply, position.code, terminal)
+        self.statistics.add(position, evaluation)
+
+    def __getitem__(self, position):
+        key = position.key
+        entry = self.entries.get(key, None)
+        if entry is None or entry[3] != position.code:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def items(self, p, n):
+        # yields (code, evaluation) of the positions in the store with n pawns and p to play
+        black = p == Player.BLACK
+        for evaluation, _, _, code, _ in self.entries.values():
+            if (code >> PLAYER_SHIFT == 1) == black and _nb_pawns(code) == n:
+                yield code, evaluation
+
+    def count(self, p, n):
+        return sum(1 for _ in self.items(p, n))
+
+    def stats(self):
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+    def print_stats(self):
+        print(f"Bounded store ({type(self.policy).__name__}): {len(self.entries)} of {self.max_entries} entries, "
+              f"hits={self.hits} misses={self.misses} evictions={self.evictions}")
+        self.statistics.print_stats()
+
+
+def _nb_pawns(code):
+    return sum(1 for i in range(NB_FILES) if (code >> (PAWN_BITS * i)) & PAWN_MASK)
+
+
+def use_bounded_store(max_entries, policy=None):
+    # replaces the global evaluation store, so all following evaluations use a bounded store
+    main.evaluation_store = BoundedEvaluationStore(max_entries, policy)
+    return main.evaluation_store
@@ -1,13 +1,12 @@
 from functools import partial
 import tkinter as tk
+from basics import FILES, RANKS, NB_RANKS
 
 PIECES = u"\u2654\u2655\u2656\u2657\u2658\u2659\u265A\u265B\u265C\u265D\u265E\u265F"
 WHITE_PAWN_CHARACTER = PIECES[5]
 BLACK_QUEEN_CHARACTER = PIECES[7]
 # noinspection SpellCheckingInspection
 CHESS_FONT = ('Segoe UI Symbol', 20)
-FILES = range(1, 9)
-RANKS = range(1, 9)
 
 
 class Square(tk.Frame):
@@ -58,7 +57,7 @@ class Board(tk.Frame):
             for rank in RANKS:
                 is_dark_square = file % 2 == rank % 2
                 self.squares[file, rank] = Square(self, is_dark_square, partial(self.square_pressed, file, rank))
-                self.squares[file, rank].grid(row=8-rank, column=file)  # put frame where the button should be
+                self.squares[file, rank].grid(row=NB_RANKS-rank, column=file)  # put frame where the button should be
 
     def set_text_on_square(self, file, rank, text):
         self.squares[file, rank].set_text(text)
@@ -0,0 +1,204 @@
+from itertools import combinations, product
+from random import Random
+from timeit import default_timer as timer
+import argparse
+import os
+import sys
+import tempfile
+import main
+from basics import *
+from notation import make_code, position_from_code, code_to_text, RESULT_CHARACTERS
+
+# Differential testing of alternative engines against the reference: Position.evaluate with a fresh
+# EvaluationStore and no oracle, dominance cache, move ordering or result sets.
+#
+# An engine maps a list of codes of valid positions (see KEYS in main.py) to their results. The positions are
+#   - exhaustive: all valid positions with at most max_exhaustive pawns (0 to 2 by default)
+#   - random: seeded samples with more pawns, uniform over the valid positions (see monte_carlo.py)
+# For every engine the mismatches are reported with the position and both results, and its time relative
+# to the reference.
+#
+#     python cross_check.py --engines sweep sharded oracle --random-pawns 3 4 --samples 200 --seed 1
+
+
+# ######################## ENGINES ##########################
+
+def _evaluate_with_fresh_globals(codes, install=None, evaluate_all=None):
+    # Position.evaluate with a fresh store and all hooks disabled, install() may set some of them
+    saved = main.evaluation_store, main.oracle, main.dominance_cache, main.move_ordering, main.result_sets
+    main.evaluation_store = main.EvaluationStore()
+    main.oracle = main.dominance_cache = main.move_ordering = main.result_sets = None
+    try:
+        if install is not None:
+            install()
+        positions = [position_from_code(code) for code in codes]
+        if evaluate_all is not None:
+            return evaluate_all(positions)
+        return [position.evaluate() for position in positions]
+    finally:
+        main.evaluation_store, main.oracle, main.dominance_cache, main.move_ordering, main.result_sets = saved
+
+
+def reference(codes):
+    return _evaluate_with_fresh_globals(codes)
+
+
+def with_oracle(codes):
+    import oracle
+    return _evaluate_with_fresh_globals(codes, oracle.enable)
+
+
+def with_dominance(codes):
+    import dominance
+    return _evaluate_with_fresh_globals(codes, dominance.enable)
+
+
+def with_move_ordering(codes):
+    import move_ordering
+    return _evaluate_with_fresh_globals(codes, move_ordering.enable)
+
+
+def with_bounded_store(codes, max_entries=1 << 16):
+    import bounded_store
+    return _evaluate_with_fresh_globals(codes, lambda: bounded_store.use_bounded_store(max_entries))
+
+
+def with_sharded_store(codes, max_workers=4):
+    import sharded_store
+    return _evaluate_with_fresh_globals(codes, sharded_store.use_sharded_store,
+                                        lambda positions: sharded_store.evaluate_all(positions, max_workers))
+
+
+def sweep(codes):
+    # solves a tablebase up to the largest number of pawns in codes and probes it
+    import sweep_solver
+    from tablebase import Tablebase
+    max_pawns = max((position_from_code(code).pawns.count() for code in codes), default=0)
+    with tempfile.TemporaryDirectory(prefix="cross_check_") as directory:
+        path = os.path.join(directory, "table.bin")
+        sweep_solver.SweepSolver(max_pawns=max_pawns, report=None).solve(path)
+        with Tablebase(path) as table:
+            return [table.probe(code) for code in codes]
+
+
+def proof_number_search(codes):
+    from proof_number_search import ProofNumberSearch
+    search = ProofNumberSearch()
+    return [search.evaluate(position_from_code(code)) for code in codes]
+
+
+ENGINES = {
+    "oracle": with_oracle,
+    "dominance": with_dominance,
+    "move-ordering": with_move_ordering,
+    "bounded": with_bounded_store,
+    "sharded": with_sharded_store,
+    "sweep": sweep,
+    "pns": proof_number_search,
+}
+
+# the oracle rules only hold on the 8 x 8 board, see oracle.py
+DEFAULT_ENGINES = (["oracle"] if (NB_FILES, NB_RANKS) == (8, 8) else []) + ["sharded", "sweep"]
+
+
+# ######################## POSITIONS ##########################
+
+def exhaustive_codes(nb_pawns):
+    # all valid positions with nb_pawns pawns, both players
+    codes = []
+    for files in combinations(FILES, nb_pawns):
+        for ranks in product(RANKS[1:], repeat=nb_pawns):
+            pawn_ranks = [0] * NB_FILES
+            for f, r in zip(files, ranks):
+                pawn_ranks[f - 1] = r
+            for square in BOARD.squares:
+                for player in Player:
+                    code = make_code(pawn_ranks, square.file, square.rank, player)
+                    if position_from_code(code).is_valid():
+                        codes.append(code)
+    return codes
+
+
+def random_codes(nb_pawns, nb_samples, seed):
+    from monte_carlo import random_code
+    rng = Random(seed)
+    players = [Player.WHITE] if nb_pawns == 0 else list(Player)
+    return [random_code(rng, players[i % len(players)], nb_pawns)[0] for i in range(nb_samples)]
+
+
+# ######################## CHECKING ##########################
+
+class Comparison:
+    def __init__(self, name, label, nb_positions, seconds, reference_seconds, mismatches):
+        self.name = name
+        self.label = label  # the positions, like "2 pawns" or "3 pawns, 200 random"
+        self.nb_positions = nb_positions
+        self.seconds = seconds
+        self.reference_seconds = reference_seconds
+        self.mismatches = mismatches  # (code, reference result, engine result)
+
+    def speedup(self):
+        return self.reference_seconds / self.seconds if self.seconds else float("inf")
+
+    def print(self, max_mismatches=10):
+        print(f"{self.name:>14} {self.label}: {self.nb_positions} positions, {len(self.mismatches)} mismatches, "
+              f"{self.seconds:.2f}s ({self.speedup():.2f}x the reference)")
+        for code, expected, result in self.mismatches[:max_mismatches]:
+            position = position_from_code(code)
+            print(f"    {code_to_text(code)} ({position}): reference {RESULT_CHARACTERS[expected]}, "
+                  f"{self.name} {RESULT_CHARACTERS.get(result, result)}")
+            print("      " + position.get_board_as_string().replace("\n", "\n      "))
+
+
+def compare(engines, codes, label):
+    # returns a Comparison per engine, all on the same codes
+    start = timer()
+    expected = reference(codes)
+    reference_seconds = timer() - start
+    result = []
+    for name in engines:
+        start = timer()
+        results = ENGINES[name](codes)
+        seconds = timer() - start
+        mismatches = [(c, e, r) for c, e, r in zip(codes, expected, results) if e != r]
+        result.append(Comparison(name, label, len(codes), seconds, reference_seconds, mismatches))
+    return result
+
+
+def cross_check(engines, max_exhaustive=2, random_pawns=(), nb_samples=100, seed=None, report=True):
+    comparisons = []
+    for n in range(max_exhaustive + 1):
+        comparisons += compare(engines, exhaustive_codes(n), f"{n} pawns")
+    for n in random_pawns:
+        comparisons += compare(engines, random_codes(n, nb_samples, seed), f"{n} pawns, {nb_samples} random")
+    if report:
+        for comparison in comparisons:
+            comparison.print()
+    return comparisons
+
+
+def make_parser():
+    # the same arguments as the cross-check subcommand of pawns_vs_queen.py, the engines are checked by run()
+    parser = argparse.ArgumentParser(description="Compare engines with the reference evaluator")
+    parser.add_argument("--engines", nargs="+", help=f"{', '.join(sorted(ENGINES))} (default: "
+                                                     f"{' '.join(DEFAULT_ENGINES)})")
+    parser.add_argument("--max-exhaustive", type=int, default=2, help="all positions up to this number of pawns")
+    parser.add_argument("--random-pawns", type=int, nargs="*", default=[3])
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def run(args):
+    engines = DEFAULT_ENGINES if args.engines is None else args.engines
+    unknown = [name for name in engines if name not in ENGINES]
+    if unknown:
+        print(f"unknown engines: {' '.join(unknown)}, choose from {' '.join(sorted(ENGINES))}", file=sys.stderr)
+        return 2
+    sys.setrecursionlimit(10000)
+    comparisons = cross_check(engines, args.max_exhaustive, args.random_pawns, args.samples, args.seed)
+    return 1 if any(c.mismatches for c in comparisons) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(make_parser().parse_args()))
@@ -0,0 +1,191 @@
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+import argparse
+import os
+import re
+from basics import FILE_LETTERS, FILES, RANKS
+
+# Headless rendering of the position strings used in ui_positions.py, e.g.
+#     "a6, g6, Qd4, =d3, •c5  # two pawns on 6th rank"
+# Each item is a square, optionally preceded by a marker:
+#   - no marker: a white pawn
+#   - "Q": the black queen
+#   - anything else ("=", "•", "a", ...): text written on the square
+# Everything after "#" is the title.
+#
+# The diagrams are written directly as SVG (no dependencies) or PNG (requires Pillow),
+# so no display server is needed and many diagrams can be rendered in parallel.
+
+WHITE_PAWN_CHARACTER = u"♙"
+BLACK_QUEEN_CHARACTER = u"♛"
+
+# the same look as chess_board_frame.py: squares of 30 x 30 and a border of 10 on all sides
+SQUARE_SIZE = 30
+BORDER = 10
+TITLE_HEIGHT = 20
+LIGHT_COLOR = "white"
+DARK_COLOR = "#D3D3D3"  # "light gray"
+
+PNG_FONTS = ["DejaVuSans.ttf", "seguisym.ttf", "Segoe UI Symbol.ttf", "Symbola.ttf"]
+
+
+_SQUARE = re.compile(f"^(.*?)([{FILE_LETTERS}])([0-9]+)$")  # marker, file letter, rank
+
+
+def parse_position_string(pos_str):
+    # returns the title and a list of (marker, file, rank), marker is "" for a pawn and "Q" for the queen
+    title = ""
+    if "#" in pos_str:
+        pos_str, title = pos_str.split("#", 1)
+        title = title.strip()
+
+    items = []
+    for square in pos_str.split(","):
+        square = square.strip()
+        if not square:
+            continue
+        match = _SQUARE.match(square)
+        assert match is not None, f"invalid square in position string: {square}"
+        marker, letter, rank = match.groups()
+        items.append((marker, FILE_LETTERS.index(letter) + 1, int(rank)))
+    return title, items
+
+
+class Diagram:
+    def __init__(self, pos_str, files=FILES, ranks=RANKS, show_title=True):
+        # files and ranks select the part of the board that is drawn, like "Capture part" in ui_positions.py
+        self.title, self.items = parse_position_string(pos_str)
+        self.files = files
+        self.ranks = ranks
+        self.show_title = show_title and self.title != ""
+
+    @property
+    def width(self):
+        return 2 * BORDER + SQUARE_SIZE * len(self.files)
+
+    @property
+    def height(self):
+        return 2 * BORDER + SQUARE_SIZE * len(self.ranks) + (TITLE_HEIGHT if self.show_title else 0)
+
+    def squares(self):
+        # yields (x, y, is_dark_square, text) for every square drawn, x and y of the upper left corner
+        text = {}
+        for marker, file, rank in self.items:
+            if marker == "Q":
+                text[file, rank] = BLACK_QUEEN_CHARACTER
+            elif marker == "":
+                text[file, rank] = WHITE_PAWN_CHARACTER
+            else:
+                text[file, rank] = marker
+
+        top = BORDER + (TITLE_HEIGHT if self.show_title else 0)
+        for row, rank in enumerate(reversed(self.ranks)):
+            for column, file in enumerate(self.files):
+                x = BORDER + column * SQUARE_SIZE
+                y = top + row * SQUARE_SIZE
+                yield x, y, file % 2 == rank % 2, text.get((file, rank), "")
+
+    def to_svg(self):
+        lines = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" '
+                 f'font-family="Segoe UI Symbol, DejaVu Sans, sans-serif">',
+                 f'<rect width="{self.width}" height="{self.height}" fill="{LIGHT_COLOR}"/>']
+        if self.show_title:
+            lines.append(f'<text x="{self.width / 2}" y="{BORDER + TITLE_HEIGHT / 2}" font-size="12" '
+                         f'text-anchor="middle" dominant-baseline="central">{escape(self.title)}</text>')
+        for x, y, is_dark_square, text in self.squares():
+            color = DARK_COLOR if is_dark_square else LIGHT_COLOR
+            lines.append(f'<rect x="{x}" y="{y}" width="{SQUARE_SIZE}" height="{SQUARE_SIZE}" fill="{color}"/>')
+            if text:
+                lines.append(f'<text x="{x + SQUARE_SIZE / 2}" y="{y + SQUARE_SIZE / 2}" font-size="20" '
+                             f'text-anchor="middle" dominant-baseline="central">{escape(text)}</text>')
+        lines.append("</svg>")
+        return "\n".join(lines) + "\n"
+
+    def to_png(self, filename, size=None, font_path=None):
+        # size is the size of the final image, e.g. (200, 200) like create_image in ui_positions.py
+        from PIL import Image, ImageDraw, ImageFont
+
+        font, piece_font_ok = _load_png_font(ImageFont, font_path, 20)
+        title_font, _ = _load_png_font(ImageFont, font_path, 12)
+
+        img = Image.new("RGB", (self.width, self.height), LIGHT_COLOR)
+        draw = ImageDraw.Draw(img)
+        if self.show_title:
+            draw.text((self.width / 2, BORDER + TITLE_HEIGHT / 2), self.title, fill="black", font=title_font,
+                      anchor="mm")
+        for x, y, is_dark_square, text in self.squares():
+            color = DARK_COLOR if is_dark_square else LIGHT_COLOR
+            draw.rectangle((x, y, x + SQUARE_SIZE - 1, y + SQUARE_SIZE - 1), fill=color)
+            if text:
+                if not piece_font_ok:
+                    # the default bitmap font has no chess characters
+                    text = {WHITE_PAWN_CHARACTER: "P", BLACK_QUEEN_CHARACTER: "Q"}.get(text, text)
+                draw.text((x + SQUARE_SIZE / 2, y + SQUARE_SIZE / 2), text, fill="black", font=font, anchor="mm")
+
+        if size is not None:
+            img = img.resize(size)
+        img.save(filename)
+
+
+def _load_png_font(image_font, font_path, size):
+    for path in ([font_path] if font_path else PNG_FONTS):
+        try:
+            return image_font.truetype(path, size), True
+        except OSError:
+            pass
+    return image_font.load_default(), False
+
+
+def render(pos_str, filename, part=False, size=None, font_path=None):
+    # part=True only draws files c-f and ranks 4-8, like "Capture part" in ui_positions.py
+    if part:
+        diagram = Diagram(pos_str, files=range(3, 7), ranks=range(4, 9), show_title=False)
+    else:
+        diagram = Diagram(pos_str)
+
+    if filename.lower().endswith(".svg"):
+        with open(filename, "w", encoding="utf-8") as file:
+            file.write(diagram.to_svg())
+    elif filename.lower().endswith(".png"):
+        diagram.to_png(filename, size=size, font_path=font_path)
+    else:
+        raise ValueError(f"unknown diagram format: {filename}")
+    return filename
+
+
+def _render_job(job):
+    return render(*job)
+
+
+def render_all(position_strings, directory, image_format="svg", part=False, size=None, font_path=None,
+               processes=None):
+    # renders position i to <directory>/position_<i>.<image_format>, in parallel
+    os.makedirs(directory, exist_ok=True)
+    jobs = [(pos_str, os.path.join(directory, f"position_{i:03d}.{image_format}"), part, size, font_path)
+            for i, pos_str in enumerate(position_strings)]
+    if processes == 1 or len(jobs) <= 1:
+        return [_render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_render_job, jobs, chunksize=max(1, len(jobs) // 64)))
+
+
+def read_position_strings(filename):
+    # one position string per line, empty lines are skipped
+    with open(filename, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render position strings to diagrams without a display")
+    parser.add_argument("input", help="file with one position string per line")
+    parser.add_argument("directory", help="output directory")
+    parser.add_argument("--format", choices=["svg", "png"], default="svg")
+    parser.add_argument("--part", action="store_true", help="only render files c-f and ranks 4-8")
+    parser.add_argument("--size", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"), help="resize png diagrams")
+    parser.add_argument("--font", help="truetype font with chess characters for png diagrams")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    filenames = render_all(read_position_strings(args.input), args.directory, args.format, args.part,
+                           tuple(args.size) if args.size else None, args.font, args.processes)
+    print(f"{len(filenames)} diagrams written to {args.directory}")
@@ -0,0 +1,328 @@
+from array import array
+from timeit import default_timer as timer
+import argparse
+import json
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from basics import *
+from generated_pawn_files_subsets import generate as generate_file_subsets
+from notation import RESULT_TYPECODE
+from evaluation_statistics import EvaluationStatistics
+from sweep_solver import NB_SQUARES, configurations_in_files, configuration_records, solve_configuration, \
+    add_statistics
+from tablebase import write_run, merge_runs
+
+# Solving with a coordinator and workers over TCP.
+#
+# A work unit is a subset of files (in the order of generated_pawn_files_subsets): all pawn configurations
+# with pawns in exactly these files. Pawn pushes stay in the unit, captures go to a unit with one file less,
+# so a unit depends on those units and nothing else (see sweep_solver.py).
+#
+# The coordinator hands out the units whose dependencies are done, with the white-to-play results of the
+# dependencies, and writes the returned results to sorted runs, merged into a tablebase file at the end.
+# Results of a unit are kept only until all units depending on it are done.
+# A unit is handed out again if its worker disconnects or returns malformed results (the connection is then
+# dropped), or when it takes longer than unit_timeout (the first result to arrive is used).
+#
+# Messages are a 4-byte length, a JSON header and header["size"] bytes of binary payload:
+#     worker      -> coordinator   {"type": "ready"}
+#     coordinator -> worker        {"type": "unit", "unit": i, "files": [...], "dependencies": [[...], ...]}
+#                                  payload: the white results of the dependencies
+#     worker      -> coordinator   {"type": "result", "unit": i}
+#                                  payload: the white and black results of the unit
+#     coordinator -> worker        {"type": "wait", "seconds": s} or {"type": "done"}
+# Results of a configuration are NB_SQUARES bytes in the format of sweep_solver.py (all NOT_VALID if none).
+#
+#     python distributed.py coordinator table.bin --port 5100 --max-pawns 8
+#     python distributed.py worker coordinator-host 5100          (on each compute node)
+#     python distributed.py local table.bin --workers 4 --max-pawns 3
+
+DEFAULT_PORT = 5100
+_LENGTH = struct.Struct("!I")
+
+
+def send_message(connection, header, payload=b""):
+    header = dict(header, size=len(payload))
+    data = json.dumps(header).encode()
+    connection.sendall(_LENGTH.pack(len(data)) + data)
+    if payload:
+        connection.sendall(payload)
+
+
+def _receive_exactly(connection, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        n = connection.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("connection closed")
+        received += n
+    return data
+
+
+def receive_message(connection):
+    length, = _LENGTH.unpack(_receive_exactly(connection, _LENGTH.size))
+    header = json.loads(_receive_exactly(connection, length).decode())
+    payload = _receive_exactly(connection, header["size"]) if header["size"] else bytearray()
+    return header, payload
+
+
+def unit_dependencies(files):
+    return [tuple(f for f in files if f != removed) for removed in files]
+
+
+def solve_unit(files, dependencies, payload):
+    # returns the results of all configurations of the unit, payload holds the white results of the dependencies
+    known = {}
+    offset = 0
+    for dependency in dependencies:
+        for config in configurations_in_files(dependency):
+            known[config] = (payload[offset:offset + NB_SQUARES], None)
+            offset += NB_SQUARES
+    assert offset == len(payload), "results of the dependencies don't match"
+    configs = configurations_in_files(files)
+    block = bytearray()
+    for config in configs:
+        known[config] = solve_configuration(config, known.__getitem__)
+        for values in known[config]:
+            block += values if values is not None else bytes(NB_SQUARES)
+    return block
+
+
+class Coordinator:
+    def __init__(self, path, host="localhost", port=DEFAULT_PORT, max_pawns=NB_FILES, unit_timeout=600,
+                 directory=None, run_size=1 << 22, report=print):
+        self.path = path
+        self.max_pawns = max_pawns
+        self.unit_timeout = unit_timeout
+        self.directory = directory
+        self.run_size = run_size
+        self.report = report
+        self.units = [tuple(files) for files in generate_file_subsets() if len(files) <= max_pawns]
+        self.index = {files: i for i, files in enumerate(self.units)}
+        self.dependencies = [[self.index[d] for d in unit_dependencies(files)] for files in self.units]
+        self.nb_dependants = [0] * len(self.units)
+        for dependencies in self.dependencies:
+            for d in dependencies:
+                self.nb_dependants[d] += 1
+        self.white_results = {}  # white_results[unit] for units done and needed by units not done
+        self.done = [False] * len(self.units)
+        self.nb_done = 0
+        self.assigned = {}  # assigned[unit] == (connection number, start time)
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.runs = []
+        self.buffer = array(RESULT_TYPECODE)
+        self.reassigned = 0
+        self.statistics = EvaluationStatistics()
+        self.server = socket.create_server((host, port))
+        self.address = self.server.getsockname()
+
+    def run(self):
+        # serves workers until all units are done, then writes the tablebase file, returns the number of positions
+        start = timer()
+        own_directory = self.directory is None
+        self._run_directory = tempfile.mkdtemp(prefix="distributed_") if own_directory else self.directory
+        if self.report:
+            self.report(f"coordinator on {self.address[0]}:{self.address[1]}, {len(self.units)} units")
+        self.server.settimeout(0.5)
+        try:
+            number = 0
+            while not self.finished.is_set():
+                try:
+                    connection, _ = self.server.accept()
+                except socket.timeout:
+                    continue
+                number += 1
+                threading.Thread(target=self._serve, args=(connection, number), daemon=True).start()
+            self.server.close()
+            self._flush()
+            count = merge_runs(self.runs, self.path)
+        finally:
+            self.server.close()
+            if own_directory:
+                shutil.rmtree(self._run_directory, ignore_errors=True)
+            else:
+                for run in self.runs:
+                    os.remove(run)
+        if self.report:
+            self.report(f"{count} positions written to {self.path} in {timer() - start:.2f}s, "
+                        f"{self.reassigned} units handed out again after a timeout")
+        return count
+
+    def _serve(self, connection, number):
+        try:
+            with connection:
+                while True:
+                    header, payload = receive_message(connection)
+                    if header["type"] == "result":
+                        self._complete(header["unit"], payload)
+                    header, payload = self._next_message(number)
+                    send_message(connection, header, payload)
+                    if header["type"] == "done":
+                        return
+        except (OSError, ConnectionError):
+            pass
+        except ValueError as error:  # a malformed message or result, the units of the worker are handed out again
+            if self.report:
+                self.report(f"connection {number} dropped: {error}")
+        finally:
+            with self.lock:
+                for unit in [u for u, (n, _) in self.assigned.items() if n == number]:
+                    del self.assigned[unit]
+
+    def _next_message(self, number):
+        with self.lock:
+            if self.nb_done == len(self.units):
+                return {"type": "done"}, b""
+            unit = self._select_unit()
+            if unit is None:
+                return {"type": "wait", "seconds": 0.2}, b""
+            self.assigned[unit] = (number, time.monotonic())
+            dependencies = self.dependencies[unit]
+            payload = b"".join(self.white_results[d] for d in dependencies)
+            return {"type": "unit", "unit": unit, "files": self.units[unit],
+                    "dependencies": [self.units[d] for d in dependencies]}, payload
+
+    def _select_unit(self):
+        # the first unit with its dependencies done that is not assigned, else the first one assigned too long ago
+        late = None
+        now = time.monotonic()
+        for unit, done in enumerate(self.done):
+            if done or not all(self.done[d] for d in self.dependencies[unit]):
+                continue
+            if unit not in self.assigned:
+                return unit
+            if late is None and now - self.assigned[unit][1] > self.unit_timeout:
+                late = unit
+        if late is not None:
+            self.reassigned += 1
+        return late
+
+    def _complete(self, unit, block):
+        if not (isinstance(unit, int) and 0 <= unit < len(self.units)):
+            raise ValueError(f"results of an unknown unit {unit}")
+        configs = configurations_in_files(self.units[unit])
+        if len(block) != 2 * NB_SQUARES * len(configs):
+            raise ValueError(f"wrong size of the results of unit {unit}")
+        with self.lock:
+            if self.done[unit]:
+                return
+            self.done[unit] = True
+            self.nb_done += 1
+            self.assigned.pop(unit, None)
+            if self.nb_dependants[unit]:
+                self.white_results[unit] = b"".join(block[2 * i * NB_SQUARES:(2 * i + 1) * NB_SQUARES]
+                                                    for i in range(len(configs)))
+            for d in self.dependencies[unit]:
+                self.nb_dependants[d] -= 1
+                if self.nb_dependants[d] == 0:
+                    del self.white_results[d]
+            for i, config in enumerate(configs):
+                offset = 2 * i * NB_SQUARES
+                results = (block[offset:offset + NB_SQUARES], block[offset + NB_SQUARES:offset + 2 * NB_SQUARES])
+                self.buffer.extend(configuration_records(config, results))
+                add_statistics(self.statistics, config, results)
+            if len(self.buffer) >= self.run_size:
+                self._flush()
+            if self.report:
+                self.report(f"unit {unit} {self.units[unit]} done, {self.nb_done}/{len(self.units)}")
+            if self.nb_done == len(self.units):
+                self.finished.set()
+
+    def _flush(self):
+        if len(self.buffer) > 0:
+            path = os.path.join(self._run_directory, f"run_{len(self.runs):05d}.bin")
+            write_run(path, self.buffer)
+            self.runs.append(path)
+            self.buffer = array(RESULT_TYPECODE)
+
+
+def connect(host, port, attempts=20, delay=0.5):
+    for attempt in range(attempts):
+        try:
+            return socket.create_connection((host, port))
+        except OSError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(delay)
+
+
+def run_worker(host="localhost", port=DEFAULT_PORT, attempts=20, report=print):
+    # solves units until the coordinator is done, returns the number of units solved
+    nb_units = 0
+    with connect(host, port, attempts) as connection:
+        send_message(connection, {"type": "ready"})
+        while True:
+            header, payload = receive_message(connection)
+            if header["type"] == "done":
+                return nb_units
+            if header["type"] == "wait":
+                time.sleep(header["seconds"])
+                send_message(connection, {"type": "ready"})
+                continue
+            assert header["type"] == "unit", f"unknown message {header['type']}"
+            start = timer()
+            block = solve_unit(tuple(header["files"]), [tuple(d) for d in header["dependencies"]], payload)
+            send_message(connection, {"type": "result", "unit": header["unit"]}, block)
+            nb_units += 1
+            if report:
+                report(f"unit {header['unit']} {tuple(header['files'])} solved in {timer() - start:.2f}s")
+
+
+def run_local(path, nb_workers=2, max_pawns=NB_FILES, port=0, report=print):
+    # coordinator in this process and nb_workers worker processes on localhost, returns the coordinator
+    coordinator = Coordinator(path, "localhost", port, max_pawns, report=report)
+    port = coordinator.address[1]
+    workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker", "localhost", str(port),
+                                 "--quiet"], cwd=os.path.dirname(os.path.abspath(__file__)))
+               for _ in range(nb_workers)]
+    try:
+        coordinator.run()
+        return coordinator
+    finally:
+        for worker in workers:
+            try:
+                worker.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve all positions with a coordinator and workers over TCP")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+    coordinator_parser = subparsers.add_parser("coordinator")
+    coordinator_parser.add_argument("output", help="tablebase file")
+    coordinator_parser.add_argument("--host", default="localhost", help="use 0.0.0.0 for workers on other hosts")
+    coordinator_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coordinator_parser.add_argument("--max-pawns", type=int, default=NB_FILES)
+    coordinator_parser.add_argument("--unit-timeout", type=float, default=600)
+    coordinator_parser.add_argument("--directory", help="directory for the runs (default: a temporary directory)")
+    coordinator_parser.add_argument("--statistics", help="write the W/D/L statistics to this CSV or JSON file")
+    worker_parser = subparsers.add_parser("worker")
+    worker_parser.add_argument("host")
+    worker_parser.add_argument("port", type=int, nargs="?", default=DEFAULT_PORT)
+    worker_parser.add_argument("--quiet", action="store_true")
+    local_parser = subparsers.add_parser("local")
+    local_parser.add_argument("output", help="tablebase file")
+    local_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    local_parser.add_argument("--max-pawns", type=int, default=NB_FILES)
+    args = parser.parse_args()
+
+    if args.mode == "coordinator":
+        coordinator = Coordinator(args.output, args.host, args.port, args.max_pawns, args.unit_timeout, args.directory)
+        coordinator.run()
+        if args.statistics:
+            coordinator.statistics.write(args.statistics)
+    elif args.mode == "worker":
+        run_worker(args.host, args.port, report=None if args.quiet else print)
+    else:
+        run_local(args.output, args.workers, args.max_pawns)
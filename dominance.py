@@ -0,0 +1,127 @@
+from itertools import combinations, product
+import main
+from main import Pawns, PosWhite
+from basics import *
+
+# Subset dominance for white-to-play positions.
+#
+# In a winning position for white, some pawns might be irrelevant: pawns on a6 and b6 win
+# (white to play) whatever other pawns there are. So we assume monotonicity:
+#     if white to play wins with pawns S and queen q,
+#     then white to play wins with pawns T and queen q, for all T containing S (if valid)
+# Additional pawns give white additional moves and restrict the queen, but the assumption is not proven,
+# so verify() checks it against the full solver.
+#
+# For each queen square we record the minimal winning pawn subsets. A position is a win if its pawns
+# contain one of them. Pawn sets are bit masks with one bit per pawn square.
+#
+# Usage:
+#     enable()            consulted (and filled) by Position.evaluate for white to play
+#     disable()
+
+
+def pawn_bit(file, rank):
+    return 1 << ((file - 1) * len(RANKS) + rank - 1)
+
+
+def pawns_to_mask(pawns):
+    mask = 0
+    for pawn in pawns.squares:
+        mask |= pawn_bit(pawn.file, pawn.rank)
+    return mask
+
+
+def mask_to_pawns(mask):
+    return Pawns(*[sq for sq in BOARD.pawn_squares if mask & pawn_bit(sq.file, sq.rank)])
+
+
+class DominanceCache:
+    def __init__(self):
+        self.minimal = {}  # minimal[queen square] is a list of masks of minimal winning pawn sets
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum(len(masks) for masks in self.minimal.values())
+
+    def _dominated(self, square, mask):
+        for m in self.minimal.get(square, ()):
+            if m & mask == m:
+                return True
+        return False
+
+    def lookup(self, position):
+        # True if position (white to play) contains a recorded minimal winning pawn set
+        if self._dominated(position.queen.square, pawns_to_mask(position.pawns)):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def record(self, position):
+        # position is a win for white to play, reduce it to a minimal winning pawn set and record that
+        assert position.player() == Player.WHITE
+        square = position.queen.square
+        mask = pawns_to_mask(position.pawns)
+        if self._dominated(square, mask):
+            return
+
+        for pawn in list(position.pawns.squares):
+            bit = pawn_bit(pawn.file, pawn.rank)
+            reduced = PosWhite(mask_to_pawns(mask & ~bit), position.queen)
+            # removing a pawn never makes the queen square attacked, so reduced is valid
+            if reduced.evaluate() == Status.WIN:
+                mask &= ~bit
+
+        masks = self.minimal.setdefault(square, [])
+        if not self._dominated(square, mask):
+            masks[:] = [m for m in masks if m & mask != mask]
+            masks.append(mask)
+
+    def verify(self, max_pawns=8, report=print):
+        # Checks every superset (up to max_pawns pawns) of every recorded set with the full solver,
+        # i.e. without this cache and with a fresh store, as the current store might contain results
+        # derived from this cache. Returns the list of failures: (minimal position, superset position, result).
+        failures = []
+        checked = 0
+        saved = main.dominance_cache, main.evaluation_store
+        main.dominance_cache = None
+        main.evaluation_store = main.EvaluationStore()
+        try:
+            for square, masks in self.minimal.items():
+                queen = Queen(square)
+                for mask in masks:
+                    minimal_position = PosWhite(mask_to_pawns(mask), queen)
+                    for superset in _supersets(mask_to_pawns(mask), max_pawns):
+                        position = PosWhite(superset, queen)
+                        if not position.is_valid():
+                            continue
+                        checked += 1
+                        result = position.evaluate()
+                        if result != Status.WIN:
+                            failures.append((minimal_position, position, result))
+                            if report:
+                                report(f"monotonicity fails: {minimal_position} wins, but {position} is {result.name}")
+        finally:
+            main.dominance_cache, main.evaluation_store = saved
+        if report:
+            report(f"dominance verified on {checked} positions: {len(failures)} failures")
+        return failures
+
+
+def _supersets(pawns, max_pawns):
+    # all proper supersets of pawns with at most max_pawns pawns and no promoted pawn
+    free_files = [f for f in FILES if pawns.pawn_in_file(f) is None]
+    for nb_added in range(1, max_pawns - pawns.count() + 1):
+        for files in combinations(free_files, nb_added):
+            for ranks in product(RANKS[1:-1], repeat=nb_added):
+                yield Pawns(*[p.square for p in pawns.squares], *[BOARD.get_square(f, r) for f, r in zip(files, ranks)])
+
+
+def enable(cache=None):
+    main.dominance_cache = cache if cache is not None else DominanceCache()
+    return main.dominance_cache
+
+
+def disable():
+    main.dominance_cache = None
@@ -0,0 +1,125 @@
+import csv
+import json
+from basics import *
+
+# W/D/L counts of evaluated positions, kept up to date on every save, so they are available without going
+# through the store again. Positions are counted per side to play and
+#   - "pawns":        the number of pawns
+#   - "files":        the files with a pawn, like "ade" ("-" for none)
+#   - "highest_rank": the highest rank of a pawn (0 for none)
+#
+# EvaluationStore counts every position it saves, table builders (see sweep_solver.py) whole configurations.
+# The counts a position adds to are cached per side and pawns, so a save costs one dictionary lookup.
+#
+#     main.evaluation_store.statistics.get("pawns", Player.BLACK, 2)     {Status.WIN: ..., ...}
+#     main.evaluation_store.statistics.write_csv("stats.csv")
+
+DIMENSIONS = ("pawns", "files", "highest_rank")
+
+
+def files_name(files):
+    return "".join(FILE_LETTERS[f - 1] for f in files) or "-"
+
+
+class EvaluationStatistics:
+    def __init__(self):
+        # histograms[dimension][player, value] == [number of LOSE, number of DRAW, number of WIN]
+        self.histograms = {dimension: {} for dimension in DIMENSIONS}
+        self._histograms = [self.histograms[dimension] for dimension in DIMENSIONS]
+        self._counts_by_pawns = {}  # (player, code of the pawns) -> the counts to add to, one per dimension
+
+    def add(self, position, evaluation):
+        pawns = position.pawns
+        key = (position.player(), pawns.code)
+        counts = self._counts_by_pawns.get(key, None)
+        if counts is None:
+            squares = [pawn.square for pawn in pawns.squares]
+            files = sorted([square.file for square in squares])
+            highest_rank = max([square.rank for square in squares], default=0)
+            counts = self._counts_by_pawns[key] = self._counts(key[0], files, highest_rank)
+        i = evaluation + 1
+        counts[0][i] += 1
+        counts[1][i] += 1
+        counts[2][i] += 1
+
+    def add_counts(self, player, pawn_ranks, nb_lose, nb_draw, nb_win):
+        # adds positions with the same pawns, pawn_ranks[file - 1] is the rank of the pawn in that file or 0
+        files = [f for f, rank in zip(FILES, pawn_ranks) if rank]
+        for c in self._counts(player, files, max(pawn_ranks, default=0)):
+            c[0] += nb_lose
+            c[1] += nb_draw
+            c[2] += nb_win
+
+    def merge(self, other):
+        # adds the counts of other, e.g. of another shard (see sharded_store.py)
+        for dimension in DIMENSIONS:
+            histogram = self.histograms[dimension]
+            for key, counts in other.histograms[dimension].items():
+                c = histogram.get(key, None)
+                if c is None:
+                    c = histogram[key] = [0, 0, 0]
+                for i in range(3):
+                    c[i] += counts[i]
+        return self
+
+    def _counts(self, player, files, highest_rank):
+        result = []
+        for histogram, value in zip(self._histograms, (len(files), tuple(files), highest_rank)):
+            counts = histogram.get((player, value), None)
+            if counts is None:
+                counts = histogram[player, value] = [0, 0, 0]
+            result.append(counts)
+        return result
+
+    def get(self, dimension, player, value):
+        # value is a tuple of files for dimension "files"
+        counts = self.histograms[dimension].get((player, value), (0, 0, 0))
+        return {Status.WIN: counts[2], Status.DRAW: counts[1], Status.LOSE: counts[0]}
+
+    def values(self, dimension, player):
+        return sorted(v for p, v in self.histograms[dimension] if p == player)
+
+    def total(self, player=None):
+        return sum(sum(c) for (p, _), c in self.histograms["pawns"].items() if player in (None, p))
+
+    def rows(self):
+        # one dict per dimension, player and value, for export
+        for dimension in DIMENSIONS:
+            for (player, value), (nb_lose, nb_draw, nb_win) in sorted(self.histograms[dimension].items()):
+                yield {"dimension": dimension, "player": player.name,
+                       "value": files_name(value) if dimension == "files" else value,
+                       "win": nb_win, "draw": nb_draw, "lose": nb_lose, "total": nb_win + nb_draw + nb_lose}
+
+    def write_csv(self, path):
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, ["dimension", "player", "value", "win", "draw", "lose", "total"])
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def to_json(self):
+        result = {dimension: {p.name: {} for p in Player} for dimension in DIMENSIONS}
+        for row in self.rows():
+            result[row["dimension"]][row["player"]][str(row["value"])] = \
+                {"win": row["win"], "draw": row["draw"], "lose": row["lose"]}
+        return result
+
+    def write_json(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_json(), file, indent=1)
+
+    def write(self, path):
+        # JSON if path ends with .json, CSV otherwise
+        if path.endswith(".json"):
+            self.write_json(path)
+        else:
+            self.write_csv(path)
+
+    def print_stats(self, dimension="pawns"):
+        for p in Player:
+            print(f"Player: {p.name}")
+            print(f"  Number of valid position: {self.total(p)}")
+            for value in self.values(dimension, p):
+                counts = self.get(dimension, p, value)
+                name = files_name(value) if dimension == "files" else value
+                print(f"    {dimension} {name}: {sum(counts.values())} "
+                      f"(W={counts[Status.WIN]} D={counts[Status.DRAW]} L={counts[Status.LOSE]})")
@@ -1,7 +1,8 @@
 from itertools import product, dropwhile, combinations
+from basics import NB_FILES
 
 
-# We generate all 256 combinations of files that are filled with pawns.
+# We generate all 256 combinations of files that are filled with pawns (on a board with 8 files).
 # First comes the combination with no files filled,
 # next those with one file filled,
 # next those with two files filled,
@@ -18,8 +19,8 @@ from itertools import product, dropwhile, combinations
 
 def generate():
     yield []
-    for nb in range(1, 9):
-        comb_list = list(combinations(range(1, 9), nb))
+    for nb in range(1, NB_FILES + 1):
+        comb_list = list(combinations(range(1, NB_FILES + 1), nb))
         comb_list.sort(key=lambda e: (list(map(lambda v: v - e[0], e[1:])), e[0]))
         # the key of [2, 3, 6] is ([1, 4], 2)
         # the key of [3, 4, 7] is ([1, 4], 3)
@@ -31,7 +32,7 @@ def generate2():
     def drop_while_false(comb):
         return list(dropwhile(lambda value: not value, comb))
 
-    comb_list = list(product([True, False], repeat=8))
+    comb_list = list(product([True, False], repeat=NB_FILES))
     comb_list.sort(key=lambda e: drop_while_false(e), reverse=True)
     comb_list.sort(key=lambda e: e.count(True))
 
@@ -53,4 +54,5 @@ def check_two_methods_equivalent():
         assert is_equivalent(c1, c2)
 
 
-check_two_methods_equivalent()
+if __name__ == "__main__":
+    check_two_methods_equivalent()
@@ -1,7 +1,12 @@
 from timeit import default_timer as timer
 from copy import deepcopy
+from random import Random
+from itertools import combinations, product
+from math import comb
 from basics import *
+from evaluation_statistics import EvaluationStatistics
 from abc import ABC, abstractmethod
+import threading
 
 
 # This is a Python script for solving the game "queen vs pawns":
@@ -114,78 +119,195 @@ from abc import ABC, abstractmethod
 #   to make it winning for the pawns.
 
 
+# ######################## KEYS ##########################
+
+# Every position has
+#   - a code: an exact integer encoding, see notation.py
+#         bits 0 ...        PAWN_BITS per file, value 0 for no pawn and rank - 1 otherwise
+#         next QUEEN_BITS   index of the queen square
+#         highest bit       0 white to play, 1 black to play
+#   - a key: a 64-bit Zobrist hash, the xor of a random number for each pawn, the queen and the player
+# Pawns compute their part of both once per configuration, so a position gets them in constant time.
+
+PAWN_BITS = (len(RANKS) - 1).bit_length()
+PAWN_MASK = (1 << PAWN_BITS) - 1
+QUEEN_SHIFT = PAWN_BITS * len(FILES)
+QUEEN_BITS = (len(FILES) * len(RANKS) - 1).bit_length()
+PLAYER_SHIFT = QUEEN_SHIFT + QUEEN_BITS
+
+_random = Random(20210101)
+PAWN_KEYS = [_random.getrandbits(64) for _ in range(len(FILES) * len(RANKS))]
+QUEEN_KEYS = [_random.getrandbits(64) for _ in range(len(FILES) * len(RANKS))]
+BLACK_KEY = _random.getrandbits(64)
+
+
+def pawn_code(square):
+    return (square.rank - 1) << (PAWN_BITS * (square.file - 1))
+
+
 # ######################## POSITIONS ##########################
 
 
 class Pawns:
-    def __init__(self, *squares):
-        self._square_dict = {}  # __squares[file] == None or __squares[file].file == file
+    # Pawn configurations are immutable and hash-consed: there is one instance per configuration, found by its code
+    # in an intern table, so positions with the same pawns share it and equal configurations are identical.
+    # All derived data is computed once, when the configuration is created.
+    # Pawns(*squares) and Pawns.from_code(code) return the instance, with_pawn and without_* give other ones.
+    # The intern table keeps every configuration created until clear_pawns() (see memory_budget.cache_sizes).
+
+    __slots__ = ("_code", "_key", "id", "_ranks", "_pawns", "_squares", "_count", "_highest_rank", "_promoted",
+                 "_attacked", "pushes")
+
+    def __new__(cls, *squares):
+        code = 0
         for square in squares:
             assert isinstance(square, Square)
-            self.set(square)
+            code = (code & ~(PAWN_MASK << (PAWN_BITS * (square.file - 1)))) | pawn_code(square)
+        return cls.from_code(code)
+
+    @classmethod
+    def from_code(cls, code):
+        result = _pawns_by_code.get(code, None)
+        if result is None:
+            with _pawns_lock:  # searches may run in threads (sharded_store.py)
+                result = _pawns_by_code.get(code, None)
+                if result is None:
+                    result = object.__new__(cls)
+                    result._create(code)
+                    pawns_by_id.append(result)
+                    _pawns_by_code[code] = result
+        return result
+
+    def _create(self, code):
+        self._code = code
+        self.id = len(pawns_by_id)  # dense, in order of creation
+        # _ranks[file - 1] is the rank of the pawn in file, 0 if none
+        self._ranks = tuple((v + 1) if v else 0 for v in ((code >> (PAWN_BITS * (f - 1))) & PAWN_MASK for f in FILES))
+        self._pawns = {f: Pawn(BOARD.get_square(f, r)) for f, r in zip(FILES, self._ranks) if r}
+        self._squares = tuple(self._pawns.values())
+        self._key = 0
+        for pawn in self._squares:
+            self._key ^= PAWN_KEYS[pawn.square.index]
+        self._count = len(self._squares)
+        self._highest_rank = max([pawn.rank for pawn in self._squares], default=0)
+        self._promoted = tuple(pawn for pawn in self._squares if pawn.is_promoted())
+        self._attacked = frozenset(BOARD.get_square(pawn.file + df, pawn.rank + 1).index
+                                   for pawn in self._squares if pawn.rank < NB_RANKS
+                                   for df in (-1, 1) if 1 <= pawn.file + df <= NB_FILES)
+        # pushes: (square after a single push, square after a double push or None) per pawn, ignoring the queen
+        self.pushes = []
+        for pawn in self._squares:
+            one = BOARD.get_neighbour(pawn.square, Direction.N)
+            if one is not None:
+                two = BOARD.get_neighbour(one, Direction.N) if one.rank == 3 else None
+                self.pushes.append((one, two))
+        self.pushes = tuple(self.pushes)
 
     def __str__(self):
         return " ".join(map(str, self.squares))
 
     def __copy__(self):
-        result = Pawns()
-        result._square_dict = self._square_dict.copy()
-        return result
+        return self
+
+    def __deepcopy__(self, _):
+        return self
 
-    def set(self, square):
+    def __reduce__(self):
+        return Pawns.from_code, (self._code,)
+
+    def with_pawn(self, square):
+        # the configuration with a pawn on square, replacing the pawn in its file
         assert isinstance(square, Square)
-        self._square_dict[square.file] = Pawn(square)  # this will automatically remove any other pawns in this file
+        return Pawns.from_code((self._code & ~(PAWN_MASK << (PAWN_BITS * (square.file - 1)))) | pawn_code(square))
+
+    def without_file(self, file):
+        return Pawns.from_code(self._code & ~(PAWN_MASK << (PAWN_BITS * (file - 1))))
 
-    def empty_file(self, file):
-        self._square_dict.pop(file, None)
+    def without_square(self, square):
+        return self.without_file(square.file) if self.occupy(square) else self
+
+    @property
+    def key(self):
+        return self._key
 
-    def empty_square(self, square):
-        if self.occupy(square):
-            self.empty_file(square.file)
+    @property
+    def code(self):
+        return self._code
 
     def count(self):
-        return len(self._square_dict)
+        return self._count
 
     @property
     def squares(self):
-        return self._square_dict.values()
+        return self._squares
 
     def get_highest_rank(self):
-        return max([pawn.rank for pawn in self.squares], default=0)
+        return self._highest_rank
 
     def get_nb_promoted(self):
-        return sum([pawn.is_promoted() for pawn in self.squares])
+        return len(self._promoted)
 
     def get_promoted_pawn(self):
-        return next(filter(lambda pawn: pawn.is_promoted(), self.squares), None)
+        return self._promoted[0] if self._promoted else None
 
     def occupy(self, square):
-        if square.file in self._square_dict:
-            return self._square_dict[square.file].rank == square.rank
-        else:
-            return False
+        return self._ranks[square.file - 1] == square.rank
 
     def attack(self, square):
-        if square.rank == 1:
-            return False
-        if square.file < 8:
-            if self.occupy(BOARD.get_neighbour(square, Direction.SE)):
-                return True
-        if square.file > 1:
-            if self.occupy(BOARD.get_neighbour(square, Direction.SW)):
-                return True
-        return False
+        return square.index in self._attacked
 
     def pawn_in_file(self, file):
-        return self._square_dict.get(file, None)
+        return self._pawns.get(file, None)
+
+
+_pawns_by_code = {}  # the intern table
+_pawns_lock = threading.Lock()
+pawns_by_id = []  # pawns_by_id[pawns.id] is pawns
+
+
+def clear_pawns():
+    # empties the intern table, e.g. between solves. Configurations created before are no longer shared
+    # with new ones and their ids are reused, so do not mix them with later ones.
+    with _pawns_lock:
+        _pawns_by_code.clear()
+        pawns_by_id.clear()
 
 
 # ######################## QUEEN MOVES ##########################
 
-counter_ws = 0
-counter_w2 = 0
-counter_bs = 0
-counter_b2 = 0
+# Search counters are kept per thread, so threads evaluating positions (see sharded_store.py) do not share them.
+# get_counters() merges the counters of all threads.
+
+class SearchCounters:
+    __slots__ = ("ws", "w2", "bs", "b2", "ply")
+
+    def __init__(self):
+        # ws/bs: evaluations with white/black to play, w2/b2: those that were searched, ply: current depth
+        self.ws = self.w2 = self.bs = self.b2 = self.ply = 0
+
+
+class _ThreadCounters(threading.local):
+    def __init__(self):
+        self.counters = SearchCounters()
+        with _all_counters_lock:
+            _all_counters.append(self.counters)
+
+
+_all_counters = []
+_all_counters_lock = threading.Lock()
+_thread_counters = _ThreadCounters()
+
+
+def get_counters():
+    # (counter_ws, counter_w2, counter_bs, counter_b2) summed over all threads
+    with _all_counters_lock:
+        return (sum(c.ws for c in _all_counters), sum(c.w2 for c in _all_counters),
+                sum(c.bs for c in _all_counters), sum(c.b2 for c in _all_counters))
+
+
+def search_ply():
+    # the distance of the position being searched in this thread to the position evaluate was called for
+    return _thread_counters.counters.ply
 
 
 class Position(ABC):
@@ -198,6 +320,16 @@ class Position(ABC):
     def is_valid(self):
         return not self.pawns.occupy(self.queen)
 
+    @property
+    def key(self):
+        result = self.pawns.key ^ QUEEN_KEYS[self.queen.square.index]
+        return result ^ BLACK_KEY if self.player() == Player.BLACK else result
+
+    @property
+    def code(self):
+        result = self.pawns.code | (self.queen.square.index << QUEEN_SHIFT)
+        return result | (1 << PLAYER_SHIFT) if self.player() == Player.BLACK else result
+
     def get_board_as_string(self):
         result = ""
         for r in reversed(RANKS):
@@ -211,7 +343,7 @@ class Position(ABC):
                 else:
                     result += " ."
             result += "\n"
-        result += "  a b c d e f g h\n"
+        result += "  " + " ".join(FILE_LETTERS) + "\n"
         return result
 
     @abstractmethod
@@ -226,6 +358,10 @@ class Position(ABC):
     def generate_moves(self):
         yield NotImplemented
 
+    @abstractmethod
+    def get_position_after_move(self, move):
+        return NotImplemented
+
     @abstractmethod
     def generate_next_positions(self):
         yield NotImplemented
@@ -235,45 +371,76 @@ class Position(ABC):
         yield NotImplemented
 
     def evaluate(self):
+        counters = _thread_counters.counters
         if self.player() == Player.WHITE:
-            global counter_ws
-            counter_ws += 1
+            counters.ws += 1
         else:
-            global counter_bs
-            counter_bs += 1
+            counters.bs += 1
+
+        if oracle is not None:
+            result = oracle.classify(self)
+            if result is not None:
+                return result
+
+        if result_sets is not None:
+            result = result_sets.classify(self)
+            if result is not None:
+                return result
+
+        if dominance_cache is not None and self.player() == Player.WHITE:
+            if dominance_cache.lookup(self):
+                return Status.WIN
 
         result = evaluation_store[self]
         if result is not None:
             return result
 
+        # work is the number of positions expanded for this evaluation including this one, ply the distance
+        # to the first call, and the position is terminal if the search did not evaluate any child
+        expanded_before = counters.w2 + counters.b2
+        visited_before = counters.ws + counters.bs
         if self.player() == Player.WHITE:
-            global counter_w2
-            counter_w2 += 1
+            counters.w2 += 1
         else:
-            global counter_b2
-            counter_b2 += 1
+            counters.b2 += 1
+        counters.ply += 1
+        try:
+            result = self.search()
+        finally:
+            counters.ply -= 1
+        evaluation_store.save(self, result, work=counters.w2 + counters.b2 - expanded_before, ply=counters.ply,
+                              terminal=counters.ws + counters.bs == visited_before)
+
+        if result == Status.WIN and dominance_cache is not None and self.player() == Player.WHITE:
+            dominance_cache.record(self)
+        return result
 
+    def search(self):
         if self.is_lost_by_definition():
-            evaluation_store.save(self, Status.LOSE)
             return Status.LOSE
 
+        moves = self.generate_moves()
+        if move_ordering is not None:
+            moves = move_ordering.order(self, moves)
+            counters = _thread_counters.counters
+            expanded_before = counters.w2 + counters.b2
+
         best = Status.LOSE
         stalemate = True
-        for next_pos in self.generate_next_positions():
+        for i, move in enumerate(moves):
             stalemate = False
-            new_eval = next_pos.evaluate()
+            new_eval = self.get_position_after_move(move).evaluate()
             if new_eval == Status.LOSE:
-                evaluation_store.save(self, Status.WIN)
+                if move_ordering is not None:
+                    move_ordering.cutoff(self, move, i + 1, counters.w2 + counters.b2 - expanded_before)
                 return Status.WIN
             if new_eval == Status.DRAW:
                 best = Status.DRAW
 
         if stalemate:  # JWA
             assert self.player() == Player.WHITE
-            evaluation_store.save(self, Status.DRAW)
             return Status.DRAW
 
-        evaluation_store.save(self, best)
         return best
 
 
@@ -298,42 +465,38 @@ class PosWhite(Position):
         return self.__repr__()
 
     def get_position_after_move_pawn_forward(self, new_pawn_square):
-        pawns = copy(self.pawns)
-        pawns.set(new_pawn_square)
-        return PosBlack(pawns, self.queen)
+        return PosBlack(self.pawns.with_pawn(new_pawn_square), self.queen)
 
     def generate_moves(self):
-        for pawn in self.pawns.squares:
-            new_pawn_square = BOARD.get_neighbour(pawn.square, Direction.N)
-            if new_pawn_square not in (None, self.queen.square):
-                yield new_pawn_square
-                if new_pawn_square.rank == 3:
-                    new_pawn_square = BOARD.get_neighbour(new_pawn_square, Direction.N)
-                    if new_pawn_square != self.queen.square:
-                        yield new_pawn_square
+        queen_square = self.queen.square
+        for one, two in self.pawns.pushes:
+            if one is not queen_square:
+                yield one
+                if two is not None and two is not queen_square:
+                    yield two
+
+    def get_position_after_move(self, move):
+        return self.get_position_after_move_pawn_forward(move)
 
     def generate_next_positions(self):
         for pawn in self.generate_moves():
             yield self.get_position_after_move_pawn_forward(pawn)
 
     def get_position_after_move_backwards_queen(self, origin):
-        pawns = deepcopy(self.pawns)
-        return PosBlack(pawns, origin)
+        return PosBlack(self.pawns, origin)
 
     def generate_prev_positions(self):
         queen_might_have_captured_a_pawn = \
-            self.pawns.pawn_in_file(self.queen.file) is None and 2 <= self.queen.rank <= 7
+            self.pawns.pawn_in_file(self.queen.file) is None and 2 <= self.queen.rank < PROMOTION_RANK
 
         for d in Direction:
             new_queen = Queen(self.queen.square)
             while new_queen.move(d):
                 if self.pawns.occupy(new_queen.square):
                     break
-                new_position = self.get_position_after_move_backwards_queen(new_queen)
-                yield new_position
+                yield self.get_position_after_move_backwards_queen(new_queen)
                 if queen_might_have_captured_a_pawn:
-                    new_position.pawns.set(self.queen.square)
-                    yield new_position
+                    yield PosBlack(self.pawns.with_pawn(self.queen.square), new_queen)
 
 
 class PosBlack(Position):
@@ -353,9 +516,7 @@ class PosBlack(Position):
         return self.__repr__()
 
     def get_position_after_move_queen(self, destination: Square):  # JWA is destination always a square?
-        pawns = deepcopy(self.pawns)
-        pawns.empty_square(destination)
-        return PosWhite(pawns, Queen(destination))
+        return PosWhite(self.pawns.without_square(destination), Queen(destination))
 
     def generate_moves(self):
         for d in Direction:
@@ -366,17 +527,18 @@ class PosBlack(Position):
                 if self.pawns.occupy(new_queen.square):
                     break
 
+    def get_position_after_move(self, move):
+        return self.get_position_after_move_queen(move)
+
     def generate_next_positions(self):
         for new_queen in self.generate_moves():
             yield self.get_position_after_move_queen(new_queen)
 
     def get_position_after_move_pawn_backwards(self, pawn_file, twice=False):
-        pawns = deepcopy(self.pawns)
-        pawn = pawns.pawn_in_file(pawn_file)
-        pawn.move(Direction.S)
+        square = BOARD.get_neighbour(self.pawns.pawn_in_file(pawn_file).square, Direction.S)
         if twice:
-            pawn.move(Direction.S)
-        return PosWhite(pawns, self.queen)
+            square = BOARD.get_neighbour(square, Direction.S)
+        return PosWhite(self.pawns.with_pawn(square), self.queen)
 
     def generate_prev_positions(self):
         promoted_pawn = self.pawns.get_promoted_pawn()
@@ -394,72 +556,94 @@ class PosBlack(Position):
 
 class EvaluationStore:
     def __init__(self):
-        self.store = {Player.WHITE: [{} for _ in range(9)],
-                      Player.BLACK: [{} for _ in range(9)]}
+        self.store = {Player.WHITE: [{} for _ in range(NB_FILES + 1)],
+                      Player.BLACK: [{} for _ in range(NB_FILES + 1)]}
         # i.e. store[p][n] contains positions with n pawns and p to play
-
-    def save(self, position, evaluation):
+        # store[p][n][key] == code * 4 + evaluation + 1, with key and code of the position (see KEYS)
+        # so the code verifies the key. A position with the same key as another one is stored in collisions.
+        self.collisions = {Player.WHITE: [{} for _ in range(NB_FILES + 1)],
+                           Player.BLACK: [{} for _ in range(NB_FILES + 1)]}
+        # i.e. collisions[p][n][code] == evaluation
+        self.statistics = EvaluationStatistics()
+
+    def save(self, position, evaluation, work=1, ply=0, terminal=False):
+        # work, ply and terminal are only used by stores with a replacement policy, see bounded_store.py
         assert isinstance(position, Position)
         assert isinstance(evaluation, Status)
         p = position.player()
         n = position.pawns.count()
-        code = self.position_to_code(position)
-        assert code not in self.store[p][n], f"position already in store: {position}"
-        self.store[p][n][code] = evaluation
+        key = position.key
+        code = position.code
+        entry = self.store[p][n].get(key, None)
+        if entry is None:
+            self.store[p][n][key] = (code << 2) | (evaluation + 1)
+        else:
+            assert entry >> 2 != code and code not in self.collisions[p][n], f"position already in store: {position}"
+            self.collisions[p][n][code] = evaluation
+        self.statistics.add(position, evaluation)
 
     def __getitem__(self, position):
         assert isinstance(position, Position)
         assert isinstance(position.pawns, Pawns)
+        p = position.player()
         n = position.pawns.count()
-        code = self.position_to_code(position)
-        return self.store[position.player()][n].get(code, None)
+        entry = self.store[p][n].get(position.key, None)
+        if entry is None:
+            return None
+        code = position.code
+        if entry >> 2 == code:
+            return _STATUS_FROM_BITS[entry & 3]
+        return self.collisions[p][n].get(code, None)
+
+    def items(self, p, n):
+        # yields (code, evaluation) of all positions with n pawns and p to play
+        for entry in self.store[p][n].values():
+            yield entry >> 2, _STATUS_FROM_BITS[entry & 3]
+        yield from self.collisions[p][n].items()
+
+    def count(self, p, n):
+        return len(self.store[p][n]) + len(self.collisions[p][n])
 
     def print_stats(self):
-        for p in Player:
-            print(f"Player: {p.name}")
-            print(f"  Number of valid position: {sum([len(x) for x in self.store[p]])}")
-            for n in range(9):
-                if len(self.store[p][n]) > 0:
-                    print(f"    Number of valid positions with {n} pawns: {len(self.store[p][n])}", end=" (")
-                    print(f"W={list(self.store[p][n].values()).count(Status.WIN)}", end=" ")
-                    print(f"D={list(self.store[p][n].values()).count(Status.DRAW)}", end=" ")
-                    print(f"L={list(self.store[p][n].values()).count(Status.LOSE)})")
-
-        for code in self.store[Player.BLACK][2]:
-            if self.store[Player.BLACK][2][code] == Status.DRAW:
-                print(code)
-
-    @staticmethod
-    def position_to_code(position):
-        result = [position.queen.file, position.queen.rank]
-        for sq in position.pawns.squares:
-            result += [sq.file, sq.rank]
-        return tuple(result)
+        self.statistics.print_stats()
+
+
+_STATUS_FROM_BITS = [Status.LOSE, Status.DRAW, Status.WIN]
 
 
+# evaluation_store might be replaced by a store with the same interface, see bounded_store.py
 evaluation_store = EvaluationStore()
 
+# optional, see oracle.py
+oracle = None
+# optional, see membership_sets.py
+result_sets = None
+# optional, see dominance.py
+dominance_cache = None
+# optional, see move_ordering.py
+move_ordering = None
+
 
 def unit_test():
     p = PosWhite(Pawns(), Queen(BOARD.get_squares(4, 5)))
     assert p.evaluate() == Status.LOSE
-    print((counter_ws, counter_w2, counter_bs, counter_b2))
+    print(get_counters())
 
     p = PosBlack(Pawns(Pawn(BOARD.get_squares(2, 8))), Queen(BOARD.get_squares(2, 3)))
     assert p.evaluate() == Status.LOSE
-    print((counter_ws, counter_w2, counter_bs, counter_b2))
+    print(get_counters())
 
     p = PosWhite(Pawns(Pawn(BOARD.get_squares(2, 7))), Queen(BOARD.get_squares(4, 8)))
     assert p.evaluate() == Status.WIN
-    print((counter_ws, counter_w2, counter_bs, counter_b2))
+    print(get_counters())
 
     p = PosWhite(Pawns(Pawn(BOARD.get_squares(2, 7))), Queen(BOARD.get_squares(2, 8)))
     assert p.evaluate() == Status.DRAW
-    print((counter_ws, counter_w2, counter_bs, counter_b2))
+    print(get_counters())
 
     p = PosBlack(Pawns(Pawn(BOARD.get_squares(2, 6))), Queen(BOARD.get_squares(2, 8)))
     assert p.evaluate() == Status.WIN
-    print((counter_ws, counter_w2, counter_bs, counter_b2))
+    print(get_counters())
 
 
 # status_char_for_black = {
@@ -562,25 +746,49 @@ def generate_and_evaluate_all_positions_with_two_pawns():
 #                             p.evaluate()
 
 
+def pawn_configuration_count(nb_pawns):
+    # the number of pawn configurations generate_and_evaluate_all_positions_with_pawns goes through
+    return comb(NB_FILES, nb_pawns) * (NB_RANKS - 1) ** nb_pawns
+
+
+def generate_and_evaluate_all_positions_with_pawns(nb_pawns, progress=None):
+    # like the functions above, for any number of pawns, progress (see progress.py) counts the pawn configurations
+    for files in combinations(FILES, nb_pawns):
+        for ranks in product(RANKS[1:], repeat=nb_pawns):
+            if progress is not None:
+                progress.advance()
+            pawns = Pawns(*[BOARD.get_square(f, r) for f, r in zip(files, ranks)])
+            for queen in BOARD.squares:
+                p = PosWhite(pawns, Queen(queen))
+                if p.is_valid():
+                    p.evaluate()
+                p = PosBlack(pawns, Queen(queen))
+                if p.is_valid():
+                    p.evaluate()
+
+
 def generate_and_evaluate():
+    nb_squares = NB_FILES * NB_RANKS
     generate_and_evaluate_all_positions_without_pawns()
-    print((counter_ws, counter_w2, counter_bs, counter_b2))
-    assert len(evaluation_store.store[Player.WHITE][0]) == 64, len(evaluation_store.store[Player.WHITE][0])
+    print(get_counters())
+    assert evaluation_store.count(Player.WHITE, 0) == nb_squares, evaluation_store.count(Player.WHITE, 0)
     generate_and_evaluate_all_positions_with_one_pawn()
-    print((counter_ws, counter_w2, counter_bs, counter_b2))
+    print(get_counters())
     # white to play:
     #  6 + 6 rook pawns each with 62 queen positions
     #  6 * 6 other pawns each with 61 queen positions
-    # so 2 * 6 * 62 + 6 * 6 * 61
-    print(len(evaluation_store.store[Player.WHITE][1]))
-    print(2 * 6 * 62 + 6 * 6 * 61)
-    assert len(evaluation_store.store[Player.WHITE][1]) == 2 * 6 * 62 + 6 * 6 * 61
+    # so 2 * 6 * 62 + 6 * 6 * 61 (on an 8 x 8 board)
+    expected = 2 * (NB_RANKS - 2) * (nb_squares - 2) + (NB_FILES - 2) * (NB_RANKS - 2) * (nb_squares - 3)
+    print(evaluation_store.count(Player.WHITE, 1))
+    print(expected)
+    assert evaluation_store.count(Player.WHITE, 1) == expected
     # black to play:
     #  8 * 7 pawn positions and 63 queen position
     # no pawns: 64
-    print(len(evaluation_store.store[Player.BLACK][1]))
-    print(8 * 7 * 63)
-    assert len(evaluation_store.store[Player.BLACK][1]) == 8 * 7 * 63
+    expected = NB_FILES * (NB_RANKS - 1) * (nb_squares - 1)
+    print(evaluation_store.count(Player.BLACK, 1))
+    print(expected)
+    assert evaluation_store.count(Player.BLACK, 1) == expected
     evaluation_store.print_stats()
     generate_and_evaluate_all_positions_with_two_pawns()
     evaluation_store.print_stats()
@@ -589,9 +797,8 @@ def generate_and_evaluate():
 
 
 def do_example():
-    pawns = Pawns()
-    pawns.set(BOARD.get_square(4, 5))
-    # pawns.set(Square((5, 5))
+    pawns = Pawns(BOARD.get_square(4, 5))
+    # pawns = pawns.with_pawn(BOARD.get_square(5, 5))
 
     for r in reversed(RANKS):
         print(r, end="")
@@ -607,7 +814,7 @@ if __name__ == "__main__":
     # unit_test()
     generate_and_evaluate()
     end = timer()
-    print((counter_ws, counter_w2, counter_bs, counter_b2))
+    print(get_counters())
     print(end - start)
 
     do_example()
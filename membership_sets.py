@@ -0,0 +1,221 @@
+from array import array
+from math import ceil, log
+import struct
+import main
+from basics import *
+from main import PAWN_BITS, PLAYER_SHIFT
+
+# Compact result sets: one Bloom filter per result (WIN, DRAW, LOSE) over the codes of solved positions
+# (see KEYS in main.py), at a configurable false-positive rate, e.g. 1% takes about 1.2 bytes per position.
+#
+# The sets cover complete layers (side to play and number of pawns), so every valid position in a covered layer
+# is in exactly one of them. A Bloom filter has no false negatives, so its own result is always among the hits:
+#   - exactly one filter contains the code: that is the result
+#   - more than one: a false positive, the result is decided exactly (by the fallback, Position.evaluate)
+# Positions in other layers are not classified.
+#
+# Usage:
+#     sets = ResultSets.from_store(main.evaluation_store, range(3), false_positive_rate=0.001)
+#     sets.write("results.bin")                    # or ResultSets.from_tablebase(Tablebase("table.bin"))
+#     main.evaluation_store = main.EvaluationStore()
+#     enable(ResultSets.read("results.bin"))       consulted by Position.evaluate before the store
+#     main.result_sets.is_result(PosBlack(pawns, queen), Status.WIN)
+
+MAGIC = b"PVQR"
+VERSION = 1
+_HEADER = struct.Struct("<4sHH")
+_LAYERS = struct.Struct("<Q")  # bit (player == BLACK) * 32 + number of pawns for each covered layer
+_FILTER_HEADER = struct.Struct("<bBQQ")  # result, number of hashes, number of bits, number of codes
+_MASK_64 = (1 << 64) - 1
+_PAWN_MASK = (1 << PAWN_BITS) - 1
+
+
+def _layer_bit(player, nb_pawns):
+    return (32 if player == Player.BLACK else 0) + nb_pawns
+
+
+def layer_of_code(code):
+    # (player, number of pawns) of the position with code
+    nb_pawns = sum(1 for i in range(NB_FILES) if (code >> (PAWN_BITS * i)) & _PAWN_MASK)
+    return Player.BLACK if code >> PLAYER_SHIFT else Player.WHITE, nb_pawns
+
+
+def _mix(x):
+    # splitmix64 finalizer, spreads the structured bits of a code over 64 bits
+    x = (x + 0x9E3779B97F4A7C15) & _MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return x ^ (x >> 31)
+
+
+class BloomFilter:
+    def __init__(self, capacity, false_positive_rate=0.01, nb_bits=None, nb_hashes=None):
+        assert 0 < false_positive_rate < 1
+        capacity = max(capacity, 1)
+        if nb_bits is None:
+            nb_bits = ceil(-capacity * log(false_positive_rate) / log(2) ** 2)
+        if nb_hashes is None:
+            nb_hashes = max(1, round(nb_bits / capacity * log(2)))
+        self.nb_bits = max(nb_bits, 8)
+        self.nb_hashes = nb_hashes
+        self.bits = bytearray((self.nb_bits + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _indices(self, code):
+        # double hashing: h1 + i * h2, with an odd h2
+        h = _mix(code)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        m = self.nb_bits
+        return [(h1 + i * h2) % m for i in range(self.nb_hashes)]
+
+    def add(self, code):
+        bits = self.bits
+        for i in self._indices(code):
+            bits[i >> 3] |= 1 << (i & 7)
+        self.count += 1
+
+    def __contains__(self, code):
+        bits = self.bits
+        for i in self._indices(code):
+            if not bits[i >> 3] & (1 << (i & 7)):
+                return False
+        return True
+
+    def false_positive_rate(self):
+        # expected rate for the number of codes added
+        return (1 - (1 - 1 / self.nb_bits) ** (self.nb_hashes * self.count)) ** self.nb_hashes
+
+    def nbytes(self):
+        return len(self.bits)
+
+
+class ResultSets:
+    def __init__(self, filters, layers):
+        self.filters = filters  # filters[status] is the BloomFilter of the codes with that result
+        self.layers = frozenset(layers)  # the (player, number of pawns) covered completely
+        self._filters = list(filters.items())
+        self.hits = 0
+        self.ambiguous = 0
+        self.misses = 0
+
+    @classmethod
+    def from_items(cls, items, layers=None, false_positive_rate=0.01):
+        # Items yields (code, evaluation) of all positions in the layers, by default the layers of the codes.
+        # Codes are collected first to size the filters.
+        codes = {status: array("Q") for status in Status}
+        seen = set()
+        for code, evaluation in items:
+            if evaluation is not None:
+                codes[evaluation].append(code)
+                if layers is None:
+                    seen.add(layer_of_code(code))
+        filters = {}
+        for status, status_codes in codes.items():
+            bloom_filter = filters[status] = BloomFilter(len(status_codes), false_positive_rate)
+            for code in status_codes:
+                bloom_filter.add(code)
+        return cls(filters, seen if layers is None else layers)
+
+    @classmethod
+    def from_store(cls, store, pawn_counts, players=tuple(Player), false_positive_rate=0.01):
+        # the positions of an EvaluationStore that holds these layers completely (e.g. after generate_and_evaluate)
+        layers = [(p, n) for p in players for n in pawn_counts]
+        return cls.from_items((item for p, n in layers for item in store.items(p, n)), layers, false_positive_rate)
+
+    @classmethod
+    def from_tablebase(cls, table, false_positive_rate=0.01):
+        # a tablebase holds the layers of its positions completely
+        return cls.from_items(table.items(), None, false_positive_rate)
+
+    def __len__(self):
+        return sum(len(f) for f in self.filters.values())
+
+    def nbytes(self):
+        return sum(f.nbytes() for f in self.filters.values())
+
+    def candidates(self, code):
+        return [status for status, bloom_filter in self._filters if code in bloom_filter]
+
+    def covers(self, position):
+        return (position.player(), position.pawns.count()) in self.layers
+
+    def classify(self, position):
+        # the result if the position is covered and exactly one filter contains it, None otherwise
+        if not self.covers(position):
+            self.misses += 1
+            return None
+        candidates = self.candidates(position.code)
+        if len(candidates) == 1:
+            self.hits += 1
+            return candidates[0]
+        self.ambiguous += 1
+        return None
+
+    def result(self, position):
+        # the exact result: from the sets when unambiguous, evaluated otherwise
+        result = self.classify(position)
+        return result if result is not None else position.evaluate()
+
+    def is_result(self, position, status):
+        # exact: a covered position that is not in the set of status is not, positive hits are checked further
+        if self.covers(position) and position.code not in self.filters[status]:
+            self.hits += 1
+            return False
+        return self.result(position) == status
+
+    def to_bytes(self):
+        parts = [_HEADER.pack(MAGIC, VERSION, len(self.filters)),
+                 _LAYERS.pack(sum(1 << _layer_bit(p, n) for p, n in self.layers))]
+        for status, f in self.filters.items():
+            parts.append(_FILTER_HEADER.pack(status, f.nb_hashes, f.nb_bits, f.count))
+            parts.append(bytes(f.bits))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, nb_filters = _HEADER.unpack_from(data)
+        assert magic == MAGIC and version == VERSION, "not a result sets file"
+        offset = _HEADER.size
+        layer_bits, = _LAYERS.unpack_from(data, offset)
+        offset += _LAYERS.size
+        layers = [(p, n) for p in Player for n in range(NB_FILES + 1) if layer_bits >> _layer_bit(p, n) & 1]
+        filters = {}
+        for _ in range(nb_filters):
+            status, nb_hashes, nb_bits, count = _FILTER_HEADER.unpack_from(data, offset)
+            offset += _FILTER_HEADER.size
+            bloom_filter = BloomFilter(max(count, 1), nb_bits=nb_bits, nb_hashes=nb_hashes)
+            size = len(bloom_filter.bits)
+            bloom_filter.bits[:] = data[offset:offset + size]
+            bloom_filter.count = count
+            offset += size
+            filters[Status(status)] = bloom_filter
+        return cls(filters, layers)
+
+    def write(self, path):
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+    def print_stats(self):
+        n = len(self)
+        print(f"Result sets: {n} positions in {self.nbytes()} bytes ({self.nbytes() / max(n, 1):.2f} per position), "
+              f"hits={self.hits} ambiguous={self.ambiguous} misses={self.misses}")
+        for status, f in self.filters.items():
+            print(f"  {status.name}: {len(f)} positions, {f.nb_bits} bits, {f.nb_hashes} hashes, "
+                  f"expected false positives {f.false_positive_rate():.2%}")
+
+
+def enable(result_sets):
+    main.result_sets = result_sets
+    return main.result_sets
+
+
+def disable():
+    main.result_sets = None
@@ -0,0 +1,221 @@
+from itertools import islice
+import os
+import sys
+import tracemalloc
+import main
+from basics import *
+
+# Memory accounting per component and a global memory budget.
+#
+# Components are measured with sys.getsizeof, for large dicts from a sample of their entries:
+#   - the evaluation store per player and number of pawns (entries and collisions)
+#   - the configurations the sweep solver keeps in memory (its frontier) and its output buffer
+#   - the caches: dominance cache, result sets, bounded store, the intern table of pawn configurations
+# With tracemalloc tracing (start_tracing()), reports also show the traced total, peak and top allocation sites.
+#
+# A MemoryBudget measures the process every check_every ticks: the traced memory if tracemalloc is tracing,
+# the resident set size otherwise. Above margin * limit the owner reacts:
+#   - SweepSolver(budget=...) spills its output buffer to a run file
+#   - BudgetedEvaluationStore evicts the largest layer, its positions are evaluated again when needed
+# and when that does not bring it below the limit, it aborts with MemoryBudgetExceeded and a report.
+# Without tracemalloc the budget is coarse: the allocator keeps most freed memory for reuse, so a reaction
+# rarely shrinks the resident set size. Then it only aborts when the usage is above the limit and still
+# grew during the reaction, and it reacts again on every check above the margin. Trace for a precise budget.
+#
+#     budget = MemoryBudget(4 << 30)
+#     main.evaluation_store = BudgetedEvaluationStore(budget)
+#     print_report(account())
+
+SAMPLE_SIZE = 1000
+
+
+class MemoryBudgetExceeded(Exception):
+    def __init__(self, usage, limit, report):
+        super().__init__(f"memory budget exceeded: {usage / 2 ** 20:.1f} MiB of {limit / 2 ** 20:.1f} MiB\n{report}")
+        self.usage = usage
+        self.limit = limit
+        self.report = report
+
+
+# ######################## MEASURING ##########################
+
+def resident_set_size():
+    # the current resident set size in bytes, None if unknown
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # the peak, as the current size is not available
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def process_memory():
+    # traced memory if tracemalloc is tracing, resident set size otherwise
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return resident_set_size()
+
+
+def dict_size(d, sample_size=SAMPLE_SIZE):
+    # bytes of d with its keys and values, estimated from its first sample_size entries for large dicts:
+    # the entries of a store layer have the same types, and no memory is allocated while near the budget
+    n = len(d)
+    if n == 0:
+        return sys.getsizeof(d)
+    items = list(islice(d.items(), sample_size))
+    per_entry = sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in items) / len(items)
+    return sys.getsizeof(d) + int(per_entry * n)
+
+
+def store_sizes(store):
+    # {("store", player, number of pawns): bytes} of an EvaluationStore, or of the other stores by their entries
+    result = {}
+    if isinstance(store, main.EvaluationStore):
+        for p in Player:
+            for n in range(NB_FILES + 1):
+                if store.store[p][n] or store.collisions[p][n]:
+                    result["store", p.name, n] = dict_size(store.store[p][n]) + dict_size(store.collisions[p][n])
+    elif hasattr(store, "entries"):  # BoundedEvaluationStore
+        result["store", "bounded", None] = dict_size(store.entries)
+    elif hasattr(store, "shards"):  # ShardedEvaluationStore
+        for shard in store.shards:
+            for key, size in store_sizes(shard).items():
+                result[key] = result.get(key, 0) + size
+    return result
+
+
+def solver_sizes(solver):
+    # {("sweep", ...): bytes} of a SweepSolver: the configurations in memory per number of pawns and the buffer
+    result = {}
+    for (n, _), configs in solver.resident.items():
+        size = sum(sys.getsizeof(config) + sum(sys.getsizeof(v) for v in solver.results[config] if v is not None)
+                   for config in configs)
+        result["sweep frontier", "configurations", n] = result.get(("sweep frontier", "configurations", n), 0) + size
+    result["sweep buffer", "records", None] = sys.getsizeof(solver.buffer)
+    return result
+
+
+def pawns_size(pawns):
+    # bytes of a pawn configuration with its derived data (see main.Pawns)
+    size = sys.getsizeof(pawns) + sys.getsizeof(pawns._ranks) + sys.getsizeof(pawns._pawns)
+    size += sum(sys.getsizeof(pawn) + sys.getsizeof(pawn.__dict__) for pawn in pawns.squares)
+    for part in (pawns.squares, pawns._promoted, pawns._attacked, pawns.pushes):
+        size += sys.getsizeof(part)
+    return size + sum(sys.getsizeof(push) for push in pawns.pushes)
+
+
+def cache_sizes():
+    # {(cache, ...): bytes} of the caches of main.py
+    result = {}
+    n = len(main.pawns_by_id)
+    if n:
+        sample = main.pawns_by_id[::max(1, n // SAMPLE_SIZE)]  # spread over the numbers of pawns
+        per_pawns = sum(pawns_size(pawns) for pawns in sample) / len(sample)
+        result["pawns intern table", "configurations", None] = (int(per_pawns * n) + sys.getsizeof(main.pawns_by_id)
+                                                                + dict_size(main._pawns_by_code))
+    if main.dominance_cache is not None:
+        result["dominance cache", "masks", None] = sum(sys.getsizeof(masks) + sum(sys.getsizeof(m) for m in masks)
+                                                       for masks in main.dominance_cache.minimal.values())
+    if main.result_sets is not None:
+        result["result sets", "filters", None] = main.result_sets.nbytes()
+    return result
+
+
+def account(store=None, solver=None):
+    # all components: the store (by default main.evaluation_store), the caches and optionally a sweep solver
+    result = store_sizes(main.evaluation_store if store is None else store)
+    result.update(cache_sizes())
+    if solver is not None:
+        result.update(solver_sizes(solver))
+    return result
+
+
+# ######################## REPORTING ##########################
+
+def start_tracing(frames=1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def report(components, top=10):
+    lines = ["Memory:"]
+    for (component, part, n), size in sorted(components.items(), key=lambda item: -item[1]):
+        lines.append(f"  {component} {part}{'' if n is None else f' {n} pawns'}: {size / 2 ** 20:.2f} MiB")
+    lines.append(f"  components total: {sum(components.values()) / 2 ** 20:.1f} MiB")
+    rss = resident_set_size()
+    if rss is not None:
+        lines.append(f"  resident set size: {rss / 2 ** 20:.1f} MiB")
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        lines.append(f"  traced: {current / 2 ** 20:.1f} MiB, peak {peak / 2 ** 20:.1f} MiB")
+        for statistic in tracemalloc.take_snapshot().statistics("lineno")[:top]:
+            lines.append(f"    {statistic.size / 2 ** 20:8.1f} MiB {statistic.count:>10} blocks  "
+                         f"{statistic.traceback[0]}")
+    return "\n".join(lines)
+
+
+def print_report(components, top=10):
+    print(report(components, top))
+
+
+# ######################## BUDGET ##########################
+
+class MemoryBudget:
+    def __init__(self, limit, margin=0.9, check_every=10000):
+        self.limit = limit  # bytes
+        self.margin = margin
+        self.check_every = check_every
+        self._ticks = 0
+        self._before = 0  # the usage at the last check
+        self.checks = 0
+        self.peak = 0
+        self.reactions = 0
+
+    def usage(self):
+        usage = process_memory() or 0
+        self.peak = max(self.peak, usage)
+        return usage
+
+    def tick(self):
+        # True if the usage is near the limit, measured once every check_every ticks
+        self._ticks += 1
+        if self._ticks < self.check_every:
+            return False
+        self._ticks = 0
+        self.checks += 1
+        self._before = self.usage()
+        return self._before >= self.margin * self.limit
+
+    def after_reaction(self, components):
+        # call after reacting on tick(), aborts if the usage is still above the limit,
+        # without tracemalloc only if it also grew since the check (see above)
+        self.reactions += 1
+        usage = self.usage()
+        if usage >= self.limit and (tracemalloc.is_tracing() or usage > self._before):
+            raise MemoryBudgetExceeded(usage, self.limit, report(components))
+
+
+class BudgetedEvaluationStore(main.EvaluationStore):
+    # An EvaluationStore that evicts its largest layer near the budget. Statistics count saves,
+    # so positions that are evaluated again after an eviction are counted again.
+    def __init__(self, budget):
+        super().__init__()
+        self.budget = budget
+        self.evicted = 0
+
+    def save(self, position, evaluation, work=1, ply=0, terminal=False):
+        super().save(position, evaluation, work, ply, terminal)
+        if self.budget.tick():
+            self.evict_largest_layer()
+            self.budget.after_reaction(account(self))
+
+    def evict_largest_layer(self):
+        p, n = max(((p, n) for p in Player for n in range(NB_FILES + 1)), key=lambda layer: self.count(*layer))
+        self.evicted += self.count(p, n)
+        self.store[p][n] = {}
+        self.collisions[p][n] = {}
@@ -0,0 +1,196 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from math import comb, sqrt
+from random import Random
+from timeit import default_timer as timer
+import argparse
+import os
+import sys
+from basics import *
+from notation import make_code, position_from_code
+from evaluation_statistics import files_name
+
+# Estimating the W/D/L distribution for numbers of pawns that are not solved completely.
+#
+# Positions are drawn uniformly from the valid positions with a side to play and a number of pawns:
+# uniformly from all files subsets, ranks and queen squares (see the counts at the top of main.py:
+# 7 ranks for each pawn when black plays, 6 when white plays and 64 queen squares), rejecting invalid ones.
+# The fraction of accepted draws also estimates the number of valid positions.
+# The samples are evaluated in worker processes by Position.evaluate, each worker keeping its store
+# for the next batches (optionally a bounded store, see bounded_store.py).
+#
+# Fractions are reported with Wilson score intervals, per number of pawns and per file subset.
+#
+#     python monte_carlo.py --pawns 3 4 --samples 2000 --processes 4
+
+Z_95 = 1.959964
+
+
+def wilson_interval(successes, n, z=Z_95):
+    # confidence interval of the fraction successes / n
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def pawn_ranks_for(player):
+    # white to play has no promoted pawn, black to play at most one (rejected later)
+    return RANKS[1:-1] if player == Player.WHITE else RANKS[1:]
+
+
+def raw_size(player, nb_pawns, files=None):
+    # the number of choices random_code draws from
+    nb_subsets = 1 if files is not None else comb(NB_FILES, nb_pawns)
+    return nb_subsets * len(pawn_ranks_for(player)) ** nb_pawns * NB_FILES * NB_RANKS
+
+
+def random_code(rng, player, nb_pawns, files=None):
+    # returns (code, files, number of draws), uniform over the valid positions
+    ranks = pawn_ranks_for(player)
+    draws = 0
+    while True:
+        draws += 1
+        chosen = tuple(files) if files is not None else tuple(sorted(rng.sample(FILES, nb_pawns)))
+        pawn_ranks = [0] * NB_FILES
+        for f in chosen:
+            pawn_ranks[f - 1] = rng.choice(ranks)
+        queen = rng.randrange(NB_FILES * NB_RANKS)
+        code = make_code(pawn_ranks, queen % NB_FILES + 1, queen // NB_FILES + 1, player)
+        if position_from_code(code).is_valid():
+            return code, chosen, draws
+
+
+class Estimate:
+    def __init__(self, player, nb_pawns, files=None):
+        self.player = player
+        self.nb_pawns = nb_pawns
+        self.files = files
+        self.counts = Counter()
+        self.counts_by_files = {}  # counts_by_files[files] == Counter of the results
+        self.draws = 0
+        self.seconds = 0.0
+        self.evaluation_seconds = 0.0
+
+    @property
+    def samples(self):
+        return sum(self.counts.values())
+
+    def add(self, files, result):
+        self.counts[result] += 1
+        self.counts_by_files.setdefault(files, Counter())[result] += 1
+
+    def fraction(self, status, files=None):
+        # (estimate, low, high)
+        counts = self.counts if files is None else self.counts_by_files.get(files, Counter())
+        n = sum(counts.values())
+        return (counts[status] / n if n else 0.0,) + wilson_interval(counts[status], n)
+
+    def valid_positions(self):
+        # estimated number of valid positions
+        return raw_size(self.player, self.nb_pawns, self.files) * self.samples / self.draws if self.draws else 0
+
+    def throughput(self):
+        return self.samples / self.seconds if self.seconds else 0.0
+
+    def print(self, by_files=False):
+        print(f"{self.player.name} to play, {self.nb_pawns} pawns: {self.samples} samples in {self.seconds:.2f}s "
+              f"({self.throughput():.1f} positions/s, {self.evaluation_seconds:.2f}s in workers), "
+              f"about {self.valid_positions():,.0f} valid positions")
+        rows = [(None, "all")]
+        if by_files:
+            rows += [(files, files_name(files)) for files in sorted(self.counts_by_files)]
+        for files, name in rows:
+            n = sum((self.counts if files is None else self.counts_by_files[files]).values())
+            text = "  ".join(f"{s.name[0]}={f:.3f} [{low:.3f}, {high:.3f}]"
+                             for s in (Status.WIN, Status.DRAW, Status.LOSE)
+                             for f, low, high in [self.fraction(s, files)])
+            print(f"    {name:>{NB_FILES}} n={n:<6} {text}")
+
+
+def _initialize_worker(max_store_entries):
+    sys.setrecursionlimit(10000)
+    if max_store_entries:
+        import bounded_store
+        bounded_store.use_bounded_store(max_store_entries)
+
+
+def _evaluate_codes(codes):
+    start = timer()
+    results = [position_from_code(code).evaluate() for code in codes]
+    return results, timer() - start
+
+
+class MonteCarloSampler:
+    def __init__(self, seed=None, processes=None, batch_size=32, max_store_entries=None):
+        self.rng = Random(seed)
+        self.processes = processes
+        self.batch_size = batch_size
+        self.max_store_entries = max_store_entries
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _map(self, batches):
+        if self.processes == 1:
+            _initialize_worker(self.max_store_entries)
+            return map(_evaluate_codes, batches)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.processes, initializer=_initialize_worker,
+                                                 initargs=(self.max_store_entries,))
+        return self._executor.map(_evaluate_codes, batches)
+
+    def sample(self, player, nb_pawns, nb_samples, files=None):
+        # returns an Estimate from nb_samples random valid positions
+        assert files is None or len(files) == nb_pawns
+        assert nb_pawns > 0 or player == Player.WHITE, "black to play needs a pawn"
+        estimate = Estimate(player, nb_pawns, files)
+        start = timer()
+        samples = []
+        for _ in range(nb_samples):
+            code, chosen, draws = random_code(self.rng, player, nb_pawns, files)
+            samples.append((code, chosen))
+            estimate.draws += draws
+        batches = [[code for code, _ in samples[i:i + self.batch_size]]
+                   for i in range(0, len(samples), self.batch_size)]
+        i = 0
+        for results, seconds in self._map(batches):
+            estimate.evaluation_seconds += seconds
+            for result in results:
+                estimate.add(samples[i][1], result)
+                i += 1
+        estimate.seconds = timer() - start
+        return estimate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate the W/D/L distribution by random sampling")
+    parser.add_argument("--pawns", type=int, nargs="+", default=[3])
+    parser.add_argument("--player", choices=["white", "black", "both"], default="both")
+    parser.add_argument("--files", type=int, nargs="+", help="only this file subset, like 1 2 5")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-store-entries", type=int, help="bounded store in each worker")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--by-files", action="store_true", help="report per file subset too")
+    args = parser.parse_args()
+
+    players = [Player.WHITE, Player.BLACK] if args.player == "both" else [Player[args.player.upper()]]
+    with MonteCarloSampler(args.seed, args.processes, args.batch_size, args.max_store_entries) as sampler:
+        for nb in args.pawns:
+            for p in players:
+                if nb > 0 or p == Player.WHITE:
+                    sampler.sample(p, nb, args.samples, args.files).print(args.by_files)
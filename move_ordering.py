@@ -0,0 +1,124 @@
+import main
+from basics import *
+
+# Move ordering for Position.search.
+#
+# Position.search stops at the first child that evaluates to LOSE (a cutoff). The sooner such a child is
+# tried, the fewer children are evaluated. Moves are ordered by
+#   1. a static score
+#        white: most advanced pawn first, with a bonus for a passed pawn (the queen is not in front of it)
+#        black: captures first, then blockades of the most advanced pawn (the queen in front of it)
+#   2. killer moves: the last moves that gave a cutoff at the same ply
+#   3. history: the positions expanded before a cutoff by a move, summed over the solve, so moves that
+#      cut off after much work rank first
+#
+# Moves are squares: the new square of the pushed pawn, or the new square of the queen.
+#
+# Usage:
+#     ordering = enable()
+#     ...
+#     ordering.print_stats()
+
+
+class MoveOrdering:
+    def __init__(self, static=True, killers=True, history=True, nb_killers=2):
+        self.static = static
+        self.killers = killers
+        self.history = history
+        self.nb_killers = nb_killers
+        self.killer_moves = {}  # killer_moves[player, ply] is a list of the last moves with a cutoff
+        self.history_scores = {Player.WHITE: {}, Player.BLACK: {}}
+        # instrumentation
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.children_before_cutoff = 0
+        self.expanded_before_cutoff = 0
+
+    def order(self, position, moves):
+        self.nodes += 1
+        moves = list(moves)
+        if len(moves) < 2:
+            return moves
+        player = position.player()
+        static_score = (self._static_score_white if player == Player.WHITE else self._static_score_black)
+        killers = self.killer_moves.get((player, main.search_ply()), ()) if self.killers else ()
+        history = self.history_scores[player]
+
+        def key(move):
+            return (static_score(position, move) if self.static else 0,
+                    move in killers,
+                    history.get(move, 0) if self.history else 0)
+
+        moves.sort(key=key, reverse=True)
+        return moves
+
+    def cutoff(self, position, move, children_tried, expanded):
+        # move gave a cutoff after children_tried children and expanded positions
+        self.cutoffs += 1
+        self.children_before_cutoff += children_tried
+        self.expanded_before_cutoff += expanded
+        if children_tried == 1:
+            self.first_move_cutoffs += 1
+
+        player = position.player()
+        if self.killers:
+            killers = self.killer_moves.setdefault((player, main.search_ply()), [])
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[self.nb_killers:]
+        if self.history:
+            scores = self.history_scores[player]
+            scores[move] = scores.get(move, 0) + expanded
+
+    @staticmethod
+    def _static_score_white(position, move):
+        score = 2 * move.rank
+        queen = position.queen
+        if not (queen.file == move.file and queen.rank > move.rank):
+            score += 1  # passed
+        return score
+
+    @staticmethod
+    def _static_score_black(position, move):
+        if position.pawns.occupy(move):
+            return 2 + move.rank  # captures, the most advanced pawn first
+        leader = max(position.pawns.squares, key=lambda pawn: pawn.rank, default=None)
+        if leader is not None and move.file == leader.file and move.rank > leader.rank:
+            return 1  # blockade
+        return 0
+
+    def stats(self):
+        return {"nodes": self.nodes, "cutoffs": self.cutoffs,
+                "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else None,
+                "children_per_cutoff": self.children_before_cutoff / self.cutoffs if self.cutoffs else None,
+                "expanded_per_cutoff": self.expanded_before_cutoff / self.cutoffs if self.cutoffs else None}
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Move ordering: {s['nodes']} nodes ordered, {s['cutoffs']} cutoffs", end="")
+        if self.cutoffs:
+            print(f", first move {100 * s['first_move_cutoff_rate']:.1f}%, "
+                  f"{s['children_per_cutoff']:.2f} children and {s['expanded_per_cutoff']:.1f} "
+                  f"positions expanded per cutoff")
+        else:
+            print()
+
+
+class NoOrdering(MoveOrdering):
+    # generation order, but with the same instrumentation
+    def __init__(self):
+        super().__init__(static=False, killers=False, history=False)
+
+    def order(self, position, moves):
+        self.nodes += 1
+        return moves
+
+
+def enable(ordering=None):
+    main.move_ordering = ordering if ordering is not None else MoveOrdering()
+    return main.move_ordering
+
+
+def disable():
+    main.move_ordering = None
@@ -0,0 +1,228 @@
+from array import array
+import argparse
+import sys
+from basics import *
+from main import Pawns, PosWhite, PosBlack, PAWN_BITS, QUEEN_SHIFT, QUEEN_BITS, PLAYER_SHIFT
+
+# Compact notation for positions (pawns, queen, side to move).
+#
+# Text notation: one character per file with the rank of the pawn ("." if there is no pawn, "a" for rank 10),
+# followed by the square of the queen and "w" (white to play) or "b" (black to play), e.g.
+#     22222222d8b     initial position
+#     ...4....c6w     PosWhite "d4 Qc6"
+#
+# Binary notation: the integer code of Position.code (see KEYS in main.py)
+#     bits 0 ...        PAWN_BITS per file, value 0 for no pawn and rank - 1 otherwise
+#     next QUEEN_BITS   index of the queen square: (file - 1) + (rank - 1) * number of files
+#     highest bit       0 white to play, 1 black to play
+# Codes sort by side first, then queen, then pawns. Files of codes are arrays of CODE_TYPECODE.
+#
+# Annotated results append the evaluation to the code (text: "22222222d8b +", binary: code * 4 + result)
+# and are stored as arrays of RESULT_TYPECODE. As the code is in the high bits, sorting results sorts by code.
+
+PAWN_MASK = (1 << PAWN_BITS) - 1
+QUEEN_MASK = (1 << QUEEN_BITS) - 1
+CODE_BITS = PLAYER_SHIFT + 1
+CODE_TYPECODE = "I" if CODE_BITS <= 32 else "Q"
+RESULT_TYPECODE = "Q"
+
+RESULT_UNKNOWN = 3
+RESULT_CHARACTERS = {Status.LOSE: "-", Status.DRAW: "=", Status.WIN: "+", None: "?"}
+_RESULT_FROM_CHARACTER = {c: s for s, c in RESULT_CHARACTERS.items()}
+_RESULT_TO_BITS = {Status.LOSE: 0, Status.DRAW: 1, Status.WIN: 2, None: RESULT_UNKNOWN}
+_RESULT_FROM_BITS = {b: s for s, b in _RESULT_TO_BITS.items()}
+
+# lookup tables for fast bulk conversion
+_PAWN_CHARACTERS = "." + "".join("0123456789a"[r] for r in RANKS[1:])
+_PAWN_VALUE = {c: v for v, c in enumerate(_PAWN_CHARACTERS)}
+_QUEEN_SQUARES = [FILE_LETTERS[i % NB_FILES] + str(i // NB_FILES + 1) for i in range(NB_FILES * NB_RANKS)]
+_QUEEN_INDEX = {sq: i for i, sq in enumerate(_QUEEN_SQUARES)}
+_PLAYER_BIT = {"w": 0, "b": 1}
+
+
+# ######################## CODES ##########################
+
+def make_code(pawn_ranks, queen_file, queen_rank, player):
+    # pawn_ranks[file - 1] is the rank of the pawn in that file, 0 if there is none
+    code = 0
+    for i, rank in enumerate(pawn_ranks):
+        if rank:
+            code |= (rank - 1) << (PAWN_BITS * i)
+    code |= ((queen_file - 1) + (queen_rank - 1) * NB_FILES) << QUEEN_SHIFT
+    if player == Player.BLACK:
+        code |= 1 << PLAYER_SHIFT
+    return code
+
+
+def split_code(code):
+    # inverse of make_code
+    pawn_ranks = tuple((v + 1) if v else 0 for v in ((code >> (PAWN_BITS * i)) & PAWN_MASK for i in range(NB_FILES)))
+    queen = (code >> QUEEN_SHIFT) & QUEEN_MASK
+    player = Player.BLACK if code >> PLAYER_SHIFT else Player.WHITE
+    return pawn_ranks, queen % NB_FILES + 1, queen // NB_FILES + 1, player
+
+
+def pawns_part(code):
+    return code & ((1 << QUEEN_SHIFT) - 1)
+
+
+def code_from_position(position):
+    return position.code
+
+
+def position_from_code(code):
+    pawn_ranks, queen_file, queen_rank, player = split_code(code)
+    pawns = Pawns(*[BOARD.get_square(f, r) for f, r in zip(FILES, pawn_ranks) if r])
+    queen = Queen(BOARD.get_square(queen_file, queen_rank))
+    return PosWhite(pawns, queen) if player == Player.WHITE else PosBlack(pawns, queen)
+
+
+# ######################## TEXT ##########################
+
+def code_to_text(code):
+    text = "".join(_PAWN_CHARACTERS[(code >> (PAWN_BITS * i)) & PAWN_MASK] for i in range(NB_FILES))
+    return text + _QUEEN_SQUARES[(code >> QUEEN_SHIFT) & QUEEN_MASK] + ("b" if code >> PLAYER_SHIFT else "w")
+
+
+def code_from_text(text):
+    code = 0
+    for i in range(NB_FILES):
+        code |= _PAWN_VALUE[text[i]] << (PAWN_BITS * i)
+    code |= _QUEEN_INDEX[text[NB_FILES:-1]] << QUEEN_SHIFT
+    return code | (_PLAYER_BIT[text[-1]] << PLAYER_SHIFT)
+
+
+def code_from_squares_string(text, player=None):
+    # Parses the ad-hoc notations: PosWhite "d4 Qc6", PosBlack "Qc6 d4" and
+    # ui_positions "a6, g6, Qd4 # ..." (markers like "=d3" are ignored).
+    # Without player, a queen in front means black to play (as in PosBlack.__repr__).
+    text = text.split("#")[0].replace(",", " ").split()
+    pawn_ranks = [0] * NB_FILES
+    queen = None
+    for i, item in enumerate(text):
+        digits = len(item) - len(item.rstrip("0123456789"))
+        marker, file, rank = item[:-digits - 1], FILE_LETTERS.find(item[-digits - 1]) + 1, int(item[-digits:])
+        if marker == "Q":
+            assert queen is None, f"more than one queen: {text}"
+            queen = file, rank
+            if player is None:
+                player = Player.BLACK if i == 0 else Player.WHITE
+        elif marker == "":
+            pawn_ranks[file - 1] = rank
+    assert queen is not None, f"no queen: {text}"
+    return make_code(pawn_ranks, *queen, Player.WHITE if player is None else player)
+
+
+def result_to_text(code, result):
+    return f"{code_to_text(code)} {RESULT_CHARACTERS[result]}"
+
+
+def result_from_text(line):
+    text, character = line.split()
+    return code_from_text(text), _RESULT_FROM_CHARACTER[character]
+
+
+# ######################## BULK ##########################
+
+def parse_text(lines):
+    # text notation (one position per line, anything after the position is ignored) to an array of codes
+    codes = array(CODE_TYPECODE)
+    for line in lines:
+        line = line.strip()
+        if line:
+            codes.append(code_from_text(line.split()[0]))
+    return codes
+
+
+def serialize_text(codes):
+    return "".join(code_to_text(code) + "\n" for code in codes)
+
+
+def read_codes(file, chunk_size=1 << 16):
+    # yields arrays of at most chunk_size codes from a binary file
+    item_size = array(CODE_TYPECODE).itemsize
+    while True:
+        data = file.read(chunk_size * item_size)
+        if not data:
+            return
+        codes = array(CODE_TYPECODE)
+        codes.frombytes(data)
+        yield codes
+
+
+def encode_results(codes, results):
+    return array(RESULT_TYPECODE, [(code << 2) | _RESULT_TO_BITS[result] for code, result in zip(codes, results)])
+
+
+def decode_result(record):
+    return record >> 2, _RESULT_FROM_BITS[record & 3]
+
+
+def read_results(file, chunk_size=1 << 16):
+    # yields arrays of at most chunk_size annotated records from a binary file
+    item_size = array(RESULT_TYPECODE).itemsize
+    while True:
+        data = file.read(chunk_size * item_size)
+        if not data:
+            return
+        records = array(RESULT_TYPECODE)
+        records.frombytes(data)
+        yield records
+
+
+# ######################## PIPELINE ##########################
+
+def evaluate_code(code):
+    position = position_from_code(code)
+    if not position.is_valid():
+        return None
+    return position.evaluate()
+
+
+def evaluate_stream(source, destination, binary_input=False, binary_output=False, chunk_size=1 << 16):
+    # Streams positions from source through Position.evaluate to destination, chunk by chunk.
+    # Invalid positions are annotated with "?" (binary: RESULT_UNKNOWN).
+    if binary_input:
+        chunks = read_codes(source, chunk_size)
+    else:
+        chunks = _text_chunks(source, chunk_size)
+
+    count = 0
+    for codes in chunks:
+        results = [evaluate_code(code) for code in codes]
+        if binary_output:
+            encode_results(codes, results).tofile(destination)
+        else:
+            destination.write("".join(result_to_text(c, r) + "\n" for c, r in zip(codes, results)))
+        count += len(codes)
+    return count
+
+
+def _text_chunks(source, chunk_size):
+    lines = []
+    for line in source:
+        lines.append(line)
+        if len(lines) == chunk_size:
+            yield parse_text(lines)
+            lines = []
+    if lines:
+        yield parse_text(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a file of positions in compact notation")
+    parser.add_argument("input", help="positions, '-' for stdin")
+    parser.add_argument("output", help="annotated results, '-' for stdout")
+    parser.add_argument("--binary-input", action="store_true")
+    parser.add_argument("--binary-output", action="store_true")
+    args = parser.parse_args()
+
+    def open_file(name, mode, binary):
+        if name == "-":
+            stream = sys.stdin if "r" in mode else sys.stdout
+            return stream.buffer if binary else stream
+        return open(name, mode + ("b" if binary else ""))
+
+    with open_file(args.input, "r", args.binary_input) as src, open_file(args.output, "w", args.binary_output) as dst:
+        n = evaluate_stream(src, dst, args.binary_input, args.binary_output)
+    print(f"{n} positions evaluated", file=sys.stderr)
@@ -0,0 +1,195 @@
+from itertools import combinations, product
+import main
+from main import Pawns, PosWhite, PosBlack
+from basics import *
+
+# Rules from proven endgame theorems (see analyse_two_pawns.py), consulted by Position.evaluate
+# before the store and before searching. A rule classifies a position cheaply or returns None.
+#
+# The rules are results on the 8 x 8 board and do not hold on other sizes (see basics.py): there they return None,
+# and enable() refuses to install the oracle.
+#
+# Each rule can check itself against the exhaustive solver: self_check(max_pawns) evaluates every
+# position up to max_pawns pawns the rule applies to, with the oracle disabled and a fresh store.
+#
+# Usage:
+#     enable()            all rules in RULES
+#     enable(Oracle([TwoPawnsOnSeventhRank()]))
+#     main.oracle.print_stats()
+
+RULES_BOARD = (8, 8)
+SUPPORTED = (NB_FILES, NB_RANKS) == RULES_BOARD
+SEVENTH_RANK = PROMOTION_RANK - 1
+SIXTH_RANK = PROMOTION_RANK - 2
+
+
+class Rule:
+    name = ""
+    player = None  # the player to move the rule applies to
+
+    def classify(self, position):
+        # the result of position with the player to move, None if the rule does not apply
+        return self._classify(position) if SUPPORTED else None
+
+    def _classify(self, position):
+        return NotImplemented
+
+    def self_check(self, max_pawns=2, report=print):
+        # returns the list of (position, rule result, solver result) where the rule is wrong
+        failures = []
+        if not SUPPORTED:
+            if report:
+                report(f"{self.name}: not checked, the rules are for the {RULES_BOARD[0]}x{RULES_BOARD[1]} board")
+            return failures
+        checked = 0
+        saved = main.oracle, main.evaluation_store
+        main.oracle = None
+        main.evaluation_store = main.EvaluationStore()
+        try:
+            for position in _all_valid_positions(self.player, max_pawns):
+                result = self.classify(position)
+                if result is None:
+                    continue
+                checked += 1
+                solved = position.evaluate()
+                if solved != result:
+                    failures.append((position, result, solved))
+                    if report:
+                        report(f"{self.name}: {position} classified {result.name}, but is {solved.name}")
+        finally:
+            main.oracle, main.evaluation_store = saved
+        if report:
+            report(f"{self.name}: checked {checked} positions up to {max_pawns} pawns, {len(failures)} failures")
+        return failures
+
+
+class PawnOnSeventhRankNotBlocked(Rule):
+    # white to play promotes a pawn on the seventh rank, unless the queen is in front of it
+    name = "pawn_on_seventh_rank_not_blocked"
+    player = Player.WHITE
+
+    def _classify(self, position):
+        queen = position.queen
+        for pawn in position.pawns.squares:
+            if pawn.rank == SEVENTH_RANK and not (queen.file == pawn.file and queen.rank == PROMOTION_RANK):
+                return Status.WIN
+        return None
+
+
+class TwoPawnsOnSeventhRank(Rule):
+    # see queen_loses_against_two_pawns_at_rank_7: the queen can stop only one of them,
+    # other pawns don't matter
+    name = "two_pawns_on_seventh_rank"
+    player = Player.BLACK
+
+    def _classify(self, position):
+        nb = 0
+        for pawn in position.pawns.squares:
+            if pawn.rank == SEVENTH_RANK:
+                nb += 1
+            elif pawn.rank == PROMOTION_RANK:
+                return None
+        return Status.LOSE if nb >= 2 else None
+
+
+class DefendedPawnOnSeventhRank(Rule):
+    # See queen_loses_against_defended_pawn_at_rank_7: the queen cannot capture the pawn on the seventh rank.
+    # Blocking it allows the defender to advance, giving two pawns on the seventh rank,
+    # capturing the defender allows the pawn to promote.
+    name = "defended_pawn_on_seventh_rank"
+    player = Player.BLACK
+
+    def _classify(self, position):
+        pawns = position.pawns
+        if pawns.get_nb_promoted() > 0:
+            return None
+        for pawn in pawns.squares:
+            if pawn.rank == SEVENTH_RANK:
+                for file in (pawn.file - 1, pawn.file + 1):
+                    defender = pawns.pawn_in_file(file)
+                    if defender is not None and defender.rank == SIXTH_RANK:
+                        return Status.LOSE
+        return None
+
+
+class QueenAheadOfTwoLowPawns(Rule):
+    # see queen_wins_against_two_pawns_at_most_one_at_rank_6
+    name = "queen_ahead_of_two_low_pawns"
+    player = Player.BLACK
+
+    def _classify(self, position):
+        pawns = position.pawns
+        if pawns.count() != 2:
+            return None
+        ranks = sorted(pawn.rank for pawn in pawns.squares)
+        if ranks[1] <= SIXTH_RANK and ranks[0] < SIXTH_RANK:
+            return Status.WIN
+        return None
+
+
+class QueenAheadOfSingleLowPawn(Rule):
+    # a single pawn at most on the sixth rank cannot escape the queen, black to play
+    name = "queen_ahead_of_single_low_pawn"
+    player = Player.BLACK
+
+    def _classify(self, position):
+        pawns = position.pawns
+        if pawns.count() == 1 and pawns.get_highest_rank() <= SIXTH_RANK:
+            return Status.WIN
+        return None
+
+
+RULES = [PawnOnSeventhRankNotBlocked, TwoPawnsOnSeventhRank, DefendedPawnOnSeventhRank,
+         QueenAheadOfTwoLowPawns, QueenAheadOfSingleLowPawn]
+
+
+class Oracle:
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else [rule() for rule in RULES]
+        self._rules_for = {p: [r for r in self.rules if r.player == p] for p in Player}
+        self.hits = {rule.name: 0 for rule in self.rules}
+        self.misses = 0
+
+    def classify(self, position):
+        for rule in self._rules_for[position.player()]:
+            result = rule.classify(position)
+            if result is not None:
+                self.hits[rule.name] += 1
+                return result
+        self.misses += 1
+        return None
+
+    def self_check(self, max_pawns=2, report=print):
+        return {rule.name: rule.self_check(max_pawns, report) for rule in self.rules}
+
+    def print_stats(self):
+        print(f"Oracle: {sum(self.hits.values())} hits, {self.misses} misses")
+        for name, hits in self.hits.items():
+            print(f"    {name}: {hits}")
+
+
+def _all_valid_positions(player, max_pawns):
+    # every valid position with player to move and at most max_pawns pawns, none promoted
+    for nb in range(max_pawns + 1):
+        for files in combinations(FILES, nb):
+            for ranks in product(RANKS[1:-1], repeat=nb):
+                pawns = Pawns(*[BOARD.get_square(f, r) for f, r in zip(files, ranks)])
+                for square in BOARD.squares:
+                    if player == Player.WHITE:
+                        position = PosWhite(pawns, Queen(square))
+                    else:
+                        position = PosBlack(pawns, Queen(square))
+                    if position.is_valid():
+                        yield position
+
+
+def enable(oracle=None):
+    if not SUPPORTED:
+        raise ValueError(f"the oracle rules are for the {RULES_BOARD[0]}x{RULES_BOARD[1]} board, "
+                         f"not {NB_FILES}x{NB_RANKS}")
+    main.oracle = oracle if oracle is not None else Oracle()
+    return main.oracle
+
+
+def disable():
+    main.oracle = None
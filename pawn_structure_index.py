@@ -0,0 +1,155 @@
+from array import array
+from main import PosWhite, PosBlack, PLAYER_SHIFT, QUEEN_SHIFT, QUEEN_BITS
+from basics import *
+from notation import RESULT_TYPECODE
+
+# Whole-board results per pawn structure: for pawns and a player to move, a bit mask per result over the
+# queen squares (bit square.index), so "+/=/-" on every square, or "does the queen win from every legal square",
+# is one lookup. Squares of invalid positions (a pawn, or an attacked square with white to play) are in no mask.
+#
+# The index is filled from a tablebase or a store, or on demand: a missing structure is evaluated on all
+# squares once (Position.evaluate) and kept.
+#
+#     index = PawnStructureIndex.from_tablebase(Tablebase("table.bin"))
+#     index.queen_wins_everywhere(Pawns(a6, c5, d3))
+#     index.summary(pawns, Player.WHITE).character(square)
+#     index.write("structures.bin")
+
+NB_SQUARES = NB_FILES * NB_RANKS
+MASK_WORDS = (NB_SQUARES + 63) // 64  # 64-bit words per mask, one on an 8 x 8 board
+_WORD = (1 << 64) - 1
+_QUEEN_MASK = (1 << QUEEN_BITS) - 1
+
+
+class StructureSummary:
+    __slots__ = ("win", "draw", "lose")
+
+    def __init__(self, win=0, draw=0, lose=0):
+        self.win = win
+        self.draw = draw
+        self.lose = lose
+
+    def mask(self, status):
+        return {Status.WIN: self.win, Status.DRAW: self.draw, Status.LOSE: self.lose}[status]
+
+    def counts(self):
+        return {Status.WIN: bin(self.win).count("1"), Status.DRAW: bin(self.draw).count("1"),
+                Status.LOSE: bin(self.lose).count("1")}
+
+    def result(self, square):
+        # the result with the queen on square, None if that position is not valid
+        bit = 1 << square.index
+        if self.win & bit:
+            return Status.WIN
+        if self.draw & bit:
+            return Status.DRAW
+        if self.lose & bit:
+            return Status.LOSE
+        return None
+
+    def character(self, square):
+        result = self.result(square)
+        return "" if result is None else str(result)
+
+    def only(self, status):
+        # True if there is a valid queen square and all of them have result status
+        mask = self.mask(status)
+        return mask != 0 and mask == self.win | self.draw | self.lose
+
+
+def _key(player, pawns_code):
+    return pawns_code | ((1 << PLAYER_SHIFT) if player == Player.BLACK else 0)
+
+
+class PawnStructureIndex:
+    def __init__(self):
+        self.summaries = {}  # summaries[key] with key the code of the pawns and the player bit of Position.code
+        self.evaluated = 0  # structures evaluated on demand
+
+    def __len__(self):
+        return len(self.summaries)
+
+    def add(self, code, result):
+        # adds the result of the position with code
+        if result is None:
+            return
+        key = code & ~(_QUEEN_MASK << QUEEN_SHIFT)
+        summary = self.summaries.get(key, None)
+        if summary is None:
+            summary = self.summaries[key] = StructureSummary()
+        bit = 1 << ((code >> QUEEN_SHIFT) & _QUEEN_MASK)
+        if result == Status.WIN:
+            summary.win |= bit
+        elif result == Status.DRAW:
+            summary.draw |= bit
+        else:
+            summary.lose |= bit
+
+    @classmethod
+    def from_items(cls, items):
+        index = cls()
+        for code, result in items:
+            index.add(code, result)
+        return index
+
+    @classmethod
+    def from_tablebase(cls, table):
+        return cls.from_items(table.items())
+
+    @classmethod
+    def from_store(cls, store, pawn_counts=range(NB_FILES + 1)):
+        # the store must hold all positions of the structures, e.g. after generate_and_evaluate
+        return cls.from_items(item for p in Player for n in pawn_counts for item in store.items(p, n))
+
+    def summary(self, pawns, player):
+        key = _key(player, pawns.code)
+        summary = self.summaries.get(key, None)
+        if summary is None:
+            summary = self.summaries[key] = self._evaluate(pawns, player)
+        return summary
+
+    def _evaluate(self, pawns, player):
+        self.evaluated += 1
+        summary = StructureSummary()
+        position_class = PosWhite if player == Player.WHITE else PosBlack
+        for square in BOARD.squares:
+            position = position_class(pawns, Queen(square))
+            if position.is_valid():
+                result = position.evaluate()
+                if result == Status.WIN:
+                    summary.win |= 1 << square.index
+                elif result == Status.DRAW:
+                    summary.draw |= 1 << square.index
+                else:
+                    summary.lose |= 1 << square.index
+        return summary
+
+    def queen_wins_everywhere(self, pawns):
+        # black to play wins with the queen on every legal square
+        return self.summary(pawns, Player.BLACK).only(Status.WIN)
+
+    def pawns_win_everywhere(self, pawns):
+        # white to play wins with the queen on every legal square
+        return self.summary(pawns, Player.WHITE).only(Status.WIN)
+
+    def write(self, path):
+        # records of a key and the three masks, each MASK_WORDS words
+        records = array(RESULT_TYPECODE)
+        for key, summary in sorted(self.summaries.items()):
+            records.append(key)
+            for mask in (summary.win, summary.draw, summary.lose):
+                records.extend((mask >> (64 * i)) & _WORD for i in range(MASK_WORDS))
+        with open(path, "wb") as file:
+            records.tofile(file)
+
+    @classmethod
+    def read(cls, path):
+        records = array(RESULT_TYPECODE)
+        with open(path, "rb") as file:
+            records.frombytes(file.read())
+        index = cls()
+        size = 1 + 3 * MASK_WORDS
+        for i in range(0, len(records), size):
+            masks = [sum(records[i + 1 + m * MASK_WORDS + w] << (64 * w) for w in range(MASK_WORDS)) for m in range(3)]
+            index.summaries[records[i]] = StructureSummary(*masks)
+        return index
@@ -0,0 +1,242 @@
+import argparse
+import sys
+
+# One command line for the tools, each subcommand imports only the modules it needs:
+#
+#     python pawns_vs_queen.py solve table.bin --max-pawns 3 [--workers 4] [--statistics stats.csv] [--progress]
+#     python pawns_vs_queen.py query 22222222d8b "a6 g6 Qd4" [--table table.bin]
+#     python pawns_vs_queen.py stats table.bin [--dimension files] [--output stats.json]
+#     python pawns_vs_queen.py verify table.bin [--diff other.bin]
+#     python pawns_vs_queen.py render positions.txt diagrams/ [--format png]
+#     python pawns_vs_queen.py sample --pawns 3 4 --samples 2000 [--by-files]
+#     python pawns_vs_queen.py sets table.bin sets.bin [--false-positive-rate 0.001]
+#     python pawns_vs_queen.py export table.bin positions.sqlite
+#     python pawns_vs_queen.py cross-check --engines sweep oracle --random-pawns 3 --samples 200
+#
+# Queries use the text notation of notation.py or the square notation of ui_positions.py, one per argument
+# or one per line on stdin with "-". With a table, a query is a binary search in the memory-mapped file,
+# without a table the position is solved on demand.
+
+
+def solve(args):
+    from basics import NB_FILES
+
+    max_pawns = NB_FILES if args.max_pawns is None else args.max_pawns
+    if args.workers > 1:
+        import distributed
+        statistics = distributed.run_local(args.output, args.workers, max_pawns).statistics
+    else:
+        import sweep_solver
+        progress = sweep_solver.make_progress(max_pawns, args.status) if args.status or args.progress else None
+        solver = sweep_solver.SweepSolver(max_pawns=max_pawns, progress=progress,
+                                          budget=sweep_solver.make_budget(args.memory_limit))
+        solver.solve(args.output)
+        statistics = solver.statistics
+    if args.statistics:
+        statistics.write(args.statistics)
+    return 0
+
+
+def parse_query(text):
+    from notation import code_from_text, code_from_squares_string
+
+    text = text.strip()
+    if " " in text or "," in text or "Q" in text:
+        return code_from_squares_string(text)
+    return code_from_text(text)
+
+
+def query(args):
+    from notation import code_to_text, RESULT_CHARACTERS
+
+    queries = sys.stdin if args.positions == ["-"] else args.positions
+    if args.table:
+        from tablebase import Tablebase
+        table = Tablebase(args.table)
+        probe = table.probe
+    else:
+        from notation import position_from_code
+        sys.setrecursionlimit(10000)
+        table = None
+
+        def probe(code):
+            position = position_from_code(code)
+            return position.evaluate() if position.is_valid() else None
+    try:
+        for text in queries:
+            if text.strip():
+                code = parse_query(text)
+                result = probe(code)
+                print(f"{code_to_text(code)} {RESULT_CHARACTERS[result] if result is not None else 'not found'}")
+    finally:
+        if table is not None:
+            table.close()
+    return 0
+
+
+def stats(args):
+    from collections import Counter
+    from basics import Player
+    from evaluation_statistics import EvaluationStatistics
+    from notation import split_code
+    from main import QUEEN_SHIFT, PLAYER_SHIFT
+    from tablebase import Tablebase
+
+    # results are counted per player and pawns first, as the statistics only depend on those
+    counts = Counter()
+    with Tablebase(args.table) as table:
+        for record in table.records:
+            code = record >> 2
+            counts[code >> PLAYER_SHIFT, code & ((1 << QUEEN_SHIFT) - 1), record & 3] += 1
+    statistics = EvaluationStatistics()
+    for (player_bit, pawns, bits), n in counts.items():
+        pawn_ranks = split_code(pawns)[0]
+        statistics.add_counts(Player.BLACK if player_bit else Player.WHITE, pawn_ranks,
+                              *[n if bits == b else 0 for b in range(3)])
+    if args.output:
+        statistics.write(args.output)
+    else:
+        statistics.print_stats(args.dimension)
+    return 0
+
+
+def verify(args):
+    import verifier
+
+    if args.diff:
+        found = verifier.diff(args.table, args.diff, args.processes, args.max_failures)
+        verifier.print_differences(found)
+    else:
+        failures, unexpected = verifier.verify(args.table, args.processes, args.max_failures, args.max_pawns)
+        found = failures or unexpected
+    return 1 if found else 0
+
+
+def render(args):
+    import diagram_renderer
+
+    if args.input == "ui_positions":
+        from ui_positions import positions
+    else:
+        positions = diagram_renderer.read_position_strings(args.input)
+    filenames = diagram_renderer.render_all(positions, args.directory, args.format, args.part,
+                                            tuple(args.size) if args.size else None, args.font, args.processes)
+    print(f"{len(filenames)} diagrams written to {args.directory}")
+    return 0
+
+
+def sample(args):
+    from basics import Player
+    from monte_carlo import MonteCarloSampler
+
+    players = [Player.WHITE, Player.BLACK] if args.player == "both" else [Player[args.player.upper()]]
+    with MonteCarloSampler(args.seed, args.processes) as sampler:
+        for nb in args.pawns:
+            for p in players:
+                if nb > 0 or p == Player.WHITE:
+                    sampler.sample(p, nb, args.samples, args.files).print(args.by_files)
+    return 0
+
+
+def sets(args):
+    from membership_sets import ResultSets
+    from tablebase import Tablebase
+
+    with Tablebase(args.table) as table:
+        result_sets = ResultSets.from_tablebase(table, args.false_positive_rate)
+    result_sets.write(args.output)
+    result_sets.print_stats()
+    return 0
+
+
+def export(args):
+    import sqlite_export
+
+    sqlite_export.export_tablebase(args.table, args.output, batch_size=args.batch_size)
+    return 0
+
+
+def cross_check(args):
+    import cross_check
+    return cross_check.run(args)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(description="Pawns against a queen")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("solve", help="solve all positions into a tablebase file")
+    p.add_argument("output")
+    p.add_argument("--max-pawns", type=int, help="default: the number of files")
+    p.add_argument("--workers", type=int, default=1, help="more than 1 for worker processes (see distributed.py)")
+    p.add_argument("--statistics", help="write the W/D/L statistics to this CSV or JSON file")
+    p.add_argument("--progress", action="store_true", help="show progress and ETA (single process)")
+    p.add_argument("--status", help="write the progress to this JSON file (single process)")
+    p.add_argument("--memory-limit", type=int, help="memory budget in MiB (single process)")
+    p.set_defaults(function=solve)
+
+    p = subparsers.add_parser("query", help="evaluate positions")
+    p.add_argument("positions", nargs="+", help='like 22222222d8b or "a6 g6 Qd4", "-" reads stdin')
+    p.add_argument("--table", help="tablebase file, solves on demand without")
+    p.set_defaults(function=query)
+
+    p = subparsers.add_parser("stats", help="W/D/L statistics of a tablebase file")
+    p.add_argument("table")
+    p.add_argument("--dimension", choices=["pawns", "files", "highest_rank"], default="pawns")
+    p.add_argument("--output", help="CSV or JSON file, prints otherwise")
+    p.set_defaults(function=stats)
+
+    p = subparsers.add_parser("verify", help="verify a tablebase file, or compare it with another one")
+    p.add_argument("table")
+    p.add_argument("--diff")
+    p.add_argument("--processes", type=int, default=None)
+    p.add_argument("--max-failures", type=int, default=100)
+    p.add_argument("--max-pawns", type=int, help="default: the most pawns in the table")
+    p.set_defaults(function=verify)
+
+    p = subparsers.add_parser("render", help="render position strings to diagrams")
+    p.add_argument("input", help='file with one position string per line, or "ui_positions"')
+    p.add_argument("directory")
+    p.add_argument("--format", choices=["svg", "png"], default="svg")
+    p.add_argument("--part", action="store_true", help="only render files c-f and ranks 4-8")
+    p.add_argument("--size", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"))
+    p.add_argument("--font")
+    p.add_argument("--processes", type=int, default=None)
+    p.set_defaults(function=render)
+
+    p = subparsers.add_parser("sample", help="estimate the W/D/L distribution by random sampling")
+    p.add_argument("--pawns", type=int, nargs="+", default=[3])
+    p.add_argument("--player", choices=["white", "black", "both"], default="both")
+    p.add_argument("--files", type=int, nargs="+", help="only this file subset, like 1 2 5")
+    p.add_argument("--samples", type=int, default=1000)
+    p.add_argument("--processes", type=int, default=None)
+    p.add_argument("--seed", type=int)
+    p.add_argument("--by-files", action="store_true")
+    p.set_defaults(function=sample)
+
+    p = subparsers.add_parser("sets", help="compact W/D/L membership sets of a tablebase file")
+    p.add_argument("table")
+    p.add_argument("output")
+    p.add_argument("--false-positive-rate", type=float, default=0.01)
+    p.set_defaults(function=sets)
+
+    p = subparsers.add_parser("export", help="export a tablebase file to SQLite")
+    p.add_argument("table")
+    p.add_argument("output", help="SQLite database, rows are added or replaced if it exists")
+    p.add_argument("--batch-size", type=int, default=50000)
+    p.set_defaults(function=export)
+
+    p = subparsers.add_parser("cross-check", help="compare engines with the reference evaluator")
+    p.add_argument("--engines", nargs="+", help="oracle, dominance, move-ordering, bounded, sharded, sweep or pns "
+                                                "(default: oracle on 8x8, sharded and sweep)")
+    p.add_argument("--max-exhaustive", type=int, default=2, help="all positions up to this number of pawns")
+    p.add_argument("--random-pawns", type=int, nargs="*", default=[3])
+    p.add_argument("--samples", type=int, default=100)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(function=cross_check)
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = make_parser().parse_args()
+    sys.exit(arguments.function(arguments))
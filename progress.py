@@ -0,0 +1,116 @@
+from timeit import default_timer as timer
+import json
+import os
+import sys
+
+# Progress of long runs: throughput, percentage done and ETA, per layer (number of pawns) and in total.
+#
+# The totals come from the enumerators (e.g. sweep_solver.configuration_count), so they are known up front.
+# advance() only adds to a counter and compares it with a threshold; the clock is read at the threshold,
+# which is set to about interval seconds of work ahead. A report is written
+#   - to stream, as one terminal line that is overwritten
+#   - to status_path, as JSON (replaced atomically), for tools that watch the run
+#
+#     progress = Progress({n: configuration_count(n) for n in range(4)}, "configurations", "status.json")
+#     progress.start_layer(0)
+#     progress.advance()
+#     ...
+#     progress.close()
+
+def format_duration(seconds):
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class Progress:
+    def __init__(self, totals, unit="positions", status_path=None, stream=sys.stderr, interval=1.0):
+        self.totals = dict(totals)  # totals[layer] is the amount of work in layer
+        self.unit = unit
+        self.status_path = status_path
+        self.stream = stream
+        self.interval = interval
+        self.total = sum(self.totals.values())
+        self.layer = None
+        self.layer_done = 0
+        self.done_before_layer = 0  # in the finished layers
+        self.start = self.layer_start = timer()
+        self._next_update = 1
+        self._last_time = self.start
+        self._last_done = 0
+
+    @property
+    def done(self):
+        return self.done_before_layer + self.layer_done
+
+    def start_layer(self, layer):
+        if self.layer is not None:
+            self.finish_layer()
+        self.layer = layer
+        self.layer_done = 0
+        self.layer_start = timer()
+        self._next_update = 1
+
+    def finish_layer(self):
+        self.layer_done = self.totals.get(self.layer, self.layer_done)
+        self._update()
+        self.done_before_layer += self.layer_done
+        self.layer_done = 0
+        self.layer = None
+        if self.stream:
+            self.stream.write("\n")
+
+    def advance(self, n=1):
+        self.layer_done += n
+        if self.layer_done >= self._next_update:
+            self._update()
+
+    def status(self):
+        now = timer()
+        elapsed = now - self.start
+        layer_elapsed = now - self.layer_start
+        layer_total = self.totals.get(self.layer, 0)
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        layer_rate = self.layer_done / layer_elapsed if layer_elapsed > 0 else 0.0
+        return {
+            "unit": self.unit,
+            "layer": self.layer,
+            "layer_done": self.layer_done,
+            "layer_total": layer_total,
+            "layer_percent": 100.0 * self.layer_done / layer_total if layer_total else 100.0,
+            "layer_eta_seconds": (layer_total - self.layer_done) / layer_rate if layer_rate > 0 else None,
+            "done": self.done,
+            "total": self.total,
+            "percent": 100.0 * self.done / self.total if self.total else 100.0,
+            "rate": rate,
+            "elapsed_seconds": elapsed,
+            "eta_seconds": (self.total - self.done) / rate if rate > 0 else None,
+        }
+
+    def _update(self):
+        now = timer()
+        done = self.done
+        # about interval seconds of work until the next update, at the rate since the last one
+        rate = (done - self._last_done) / (now - self._last_time) if now > self._last_time else 0.0
+        self._next_update = self.layer_done + max(1, int(rate * self.interval))
+        self._last_time, self._last_done = now, done
+        self.report(self.status())
+
+    def report(self, status):
+        if self.stream:
+            self.stream.write(f"\rlayer {status['layer']}: {status['layer_percent']:5.1f}% "
+                              f"{status['layer_done']}/{status['layer_total']} {self.unit}, "
+                              f"ETA {format_duration(status['layer_eta_seconds'])} | "
+                              f"total {status['percent']:5.1f}% {status['rate']:.0f} {self.unit}/s, "
+                              f"ETA {format_duration(status['eta_seconds'])}  ")
+            self.stream.flush()
+        if self.status_path:
+            temporary = self.status_path + ".tmp"
+            with open(temporary, "w") as file:
+                json.dump(status, file, indent=1)
+            os.replace(temporary, self.status_path)
+
+    def close(self):
+        if self.layer is not None:
+            self.finish_layer()
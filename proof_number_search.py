@@ -0,0 +1,180 @@
+import argparse
+from timeit import default_timer as timer
+from basics import *
+from main import Position
+from notation import code_from_text, position_from_code
+
+# Depth-first proof-number search (df-pn) for single positions.
+#
+# Position.evaluate solves a position by evaluating (and storing) its whole subtree. To answer one hard
+# position, like the initial position, proof-number search only expands the most-proving nodes and
+# proves or disproves "the player to move in the root wins".
+#
+# The player to move in the root is the attacker. OR nodes have the attacker to move, AND nodes the defender.
+# pn is the number of nodes to expand to prove the attacker wins, dn to disprove it (draw or lose).
+#     OR node:   pn = min pn of children,  dn = sum dn of children
+#     AND node:  pn = sum pn of children,  dn = min dn of children
+# Terminal nodes:
+#     - lost by definition (no pawns left for white, or a promoted pawn for black):
+#       proven if the defender is to move, disproven if the attacker is to move
+#     - no legal move (white only): draw, so disproven
+# The game is acyclic (every white move pushes a pawn), so no cycle handling is needed.
+#
+# The transposition table maps position keys to (pn, dn, code), the code verifies the key, and holds at most
+# max_entries entries; when full, the unsolved entries are dropped. The search gives up after max_nodes expansions.
+
+INFINITY = 1 << 40
+
+
+class SearchAborted(Exception):
+    pass
+
+
+class ProofNumberSearch:
+    def __init__(self, max_entries=1 << 22, max_nodes=None):
+        self.max_entries = max_entries
+        self.max_nodes = max_nodes
+        self.tables = {Player.WHITE: {}, Player.BLACK: {}}  # tables[attacker][key] == (pn, dn, code)
+        self.nodes_expanded = 0
+        self.nodes_terminal = 0
+        self.table_purges = 0
+        self.root_pn = None
+        self.root_dn = None
+        self.time = 0.0
+
+    def stats(self):
+        return {"pn": self.root_pn, "dn": self.root_dn,
+                "nodes_expanded": self.nodes_expanded, "nodes_terminal": self.nodes_terminal,
+                "table_entries": sum(len(t) for t in self.tables.values()), "table_purges": self.table_purges,
+                "time": self.time}
+
+    def prove(self, root: Position):
+        # True if the player to move wins, False if not (draw or lose), None if the search was aborted
+        start = timer()
+        table = self.tables[root.player()]
+        try:
+            self._mid(root, root.key, root.code, root.player(), table, INFINITY, INFINITY)
+        except SearchAborted:
+            pass
+        self.time += timer() - start
+        self.root_pn, self.root_dn = _lookup(table, root.key, root.code)
+        if self.root_pn == 0:
+            return True
+        if self.root_dn == 0:
+            return False
+        return None
+
+    def evaluate(self, root: Position):
+        # Status for the player to move, using one extra search per child if the win is disproven
+        won = self.prove(root)
+        if won is None:
+            return None
+        if won:
+            return Status.WIN
+        if root.is_lost_by_definition():
+            return Status.LOSE
+        children = list(root.generate_next_positions())
+        if not children:
+            return Status.DRAW
+        for child in children:
+            child_wins = self.prove(child)
+            if child_wins is None:
+                return None
+            if not child_wins:
+                return Status.DRAW
+        return Status.LOSE
+
+    def _store(self, table, key, code, pn, dn):
+        # a position with the same key as another one replaces it
+        if len(table) >= self.max_entries and key not in table:
+            self._purge(table)
+        table[key] = (pn, dn, code)
+
+    def _purge(self, table):
+        # keep only proven and disproven entries; if those fill the table, drop everything
+        self.table_purges += 1
+        solved = {k: v for k, v in table.items() if v[0] == 0 or v[1] == 0}
+        table.clear()
+        if len(solved) < self.max_entries // 2:
+            table.update(solved)
+
+    def _expand(self, position, attacker):
+        # returns the list of (key, code, child) or None and (pn, dn) for a terminal node
+        is_or_node = position.player() == attacker
+        if position.is_lost_by_definition():
+            self.nodes_terminal += 1
+            return None, (INFINITY, 0) if is_or_node else (0, INFINITY)
+        children = [(child.key, child.code, child) for child in position.generate_next_positions()]
+        if not children:
+            self.nodes_terminal += 1
+            return None, (INFINITY, 0)
+        self.nodes_expanded += 1
+        if self.max_nodes is not None and self.nodes_expanded > self.max_nodes:
+            raise SearchAborted()
+        return children, None
+
+    def _mid(self, position, key, code, attacker, table, threshold_pn, threshold_dn):
+        children, terminal = self._expand(position, attacker)
+        if children is None:
+            self._store(table, key, code, *terminal)
+            return
+
+        is_or_node = position.player() == attacker
+        while True:
+            # select the most-proving child and the second best proof (OR) or disproof (AND) number
+            best = None
+            best_value = second_value = INFINITY
+            sum_value = 0
+            for i, (child_key, child_code, _) in enumerate(children):
+                pn, dn = _lookup(table, child_key, child_code)
+                value, other = (pn, dn) if is_or_node else (dn, pn)
+                sum_value = min(sum_value + other, INFINITY)
+                if value < best_value:
+                    best, second_value, best_value = i, best_value, value
+                elif value < second_value:
+                    second_value = value
+
+            if is_or_node:
+                pn, dn = best_value, sum_value
+            else:
+                pn, dn = sum_value, best_value
+            if pn >= threshold_pn or dn >= threshold_dn:
+                break
+
+            child_key, child_code, child = children[best]
+            child_pn, child_dn = _lookup(table, child_key, child_code)
+            if is_or_node:
+                child_threshold_pn = min(threshold_pn, second_value + 1)
+                child_threshold_dn = min(threshold_dn - dn + child_dn, INFINITY)
+            else:
+                child_threshold_dn = min(threshold_dn, second_value + 1)
+                child_threshold_pn = min(threshold_pn - pn + child_pn, INFINITY)
+            try:
+                self._mid(child, child_key, child_code, attacker, table, child_threshold_pn, child_threshold_dn)
+            except SearchAborted:
+                # keep the numbers found so far, so the root reports its current pn and dn
+                self._store(table, key, code, pn, dn)
+                raise
+
+        self._store(table, key, code, pn, dn)
+
+
+def _lookup(table, key, code):
+    # (pn, dn) of a position, (1, 1) if it is not in the table
+    entry = table.get(key, None)
+    if entry is None or entry[2] != code:
+        return 1, 1
+    return entry[0], entry[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prove or disprove a win for the player to move")
+    parser.add_argument("position", nargs="?", default="22222222d8b", help="position in compact text notation")
+    parser.add_argument("--max-entries", type=int, default=1 << 22)
+    parser.add_argument("--max-nodes", type=int, default=None)
+    args = parser.parse_args()
+
+    search = ProofNumberSearch(args.max_entries, args.max_nodes)
+    root_position = position_from_code(code_from_text(args.position))
+    result = search.prove(root_position)
+    print(root_position, {True: "WIN", False: "no WIN", None: "unknown"}[result], search.stats())
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import main
+from basics import *
+from evaluation_statistics import EvaluationStatistics
+
+# A thread-safe replacement for EvaluationStore, so one process can evaluate positions in a thread pool
+# (in parallel on a free-threaded Python) with one shared store.
+#
+# Positions are spread over shards by their key, each shard is an EvaluationStore with its own lock:
+#   - a save inserts the position if it is absent, as two threads might evaluate the same position at the same
+#     time: both find the same result, the second save is ignored
+#   - a lookup takes no lock, as entries are never changed once inserted
+# Every shard counts the positions it saves, the statistics are merged when they are read.
+# The search counters of main.py are per thread and merged by main.get_counters().
+#
+# Only the store and the counters are shared safely; do not enable the oracle, dominance cache or move ordering.
+#
+# Usage:
+#     use_sharded_store()
+#     evaluate_all(positions, max_workers=8)
+
+DEFAULT_NB_SHARDS = 64
+THREAD_STACK_SIZE = 256 << 20  # the search recurses deeply
+
+
+class ShardedEvaluationStore:
+    def __init__(self, nb_shards=DEFAULT_NB_SHARDS):
+        assert nb_shards > 0 and nb_shards & (nb_shards - 1) == 0, "the number of shards must be a power of two"
+        self.mask = nb_shards - 1
+        self.shards = [main.EvaluationStore() for _ in range(nb_shards)]
+        self.locks = [threading.Lock() for _ in range(nb_shards)]
+        self.duplicates_per_shard = [0] * nb_shards
+
+    def save(self, position, evaluation, work=1, ply=0, terminal=False):
+        i = position.key & self.mask
+        shard = self.shards[i]
+        with self.locks[i]:
+            if shard[position] is None:
+                shard.save(position, evaluation, work, ply, terminal)
+            else:
+                self.duplicates_per_shard[i] += 1
+
+    @property
+    def duplicates(self):
+        return sum(self.duplicates_per_shard)
+
+    def __getitem__(self, position):
+        return self.shards[position.key & self.mask][position]
+
+    def items(self, p, n):
+        for shard in self.shards:
+            yield from shard.items(p, n)
+
+    def count(self, p, n):
+        return sum(shard.count(p, n) for shard in self.shards)
+
+    @property
+    def statistics(self):
+        result = EvaluationStatistics()
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                result.merge(shard.statistics)
+        return result
+
+    def print_stats(self):
+        self.statistics.print_stats()
+        print(f"Sharded store: {len(self.shards)} shards, duplicate saves={self.duplicates}")
+
+
+def use_sharded_store(nb_shards=DEFAULT_NB_SHARDS):
+    # replaces the global evaluation store, so all following evaluations use a sharded store
+    main.evaluation_store = ShardedEvaluationStore(nb_shards)
+    return main.evaluation_store
+
+
+def evaluate_all(positions, max_workers=None):
+    # the evaluations of positions, evaluated by a thread pool, in order
+    stack_size = threading.stack_size(THREAD_STACK_SIZE)
+    try:
+        with ThreadPoolExecutor(max_workers) as executor:
+            return list(executor.map(lambda position: position.evaluate(), positions))
+    finally:
+        threading.stack_size(stack_size)
@@ -0,0 +1,119 @@
+from multiprocessing import shared_memory
+import struct
+import main
+from basics import *
+from notation import RESULT_TYPECODE
+from tablebase import RECORD_SIZE, SortedRecords
+
+# A tablebase (see tablebase.py) in shared memory, for analysis worker processes.
+#
+# One process copies the table into a named shared memory block, the workers attach by name and probe
+# the records in place: no copy, no unpickling. So 64 workers use one copy of the table instead of 64 stores.
+# The block starts with the number of records, as the block might be larger than requested.
+#
+# In a worker, TablebaseStore replaces the evaluation store: Position.evaluate finds solved positions in the
+# table, and only positions outside the table are searched and kept in a local store.
+#
+#     with SharedTablebase.create("table.bin") as table:
+#         with ProcessPoolExecutor(initializer=use_shared_tablebase, initargs=(table.name,)) as executor:
+#             ...
+
+_HEADER = struct.Struct("=" + RESULT_TYPECODE)
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)  # Python 3.13
+    except TypeError:
+        # workers share the resource tracker of the process that created the block, so this registers it again
+        return shared_memory.SharedMemory(name)
+
+
+class SharedTablebase(SortedRecords):
+    def __init__(self, memory, owner):
+        self._memory = memory
+        self.owner = owner
+        n, = _HEADER.unpack_from(memory.buf)
+        records = memory.buf.cast(RESULT_TYPECODE)
+        self.records = records[1:1 + n]  # the header has the size of a record
+        records.release()
+
+    @classmethod
+    def create(cls, path, name=None, chunk_size=1 << 16):
+        # copies the tablebase file at path into a new shared memory block, read chunk by chunk
+        with open(path, "rb") as file:
+            file.seek(0, 2)
+            size = file.tell()
+            assert size % RECORD_SIZE == 0, f"not a tablebase file: {path}"
+            memory = shared_memory.SharedMemory(name, create=True, size=_HEADER.size + size)
+            _HEADER.pack_into(memory.buf, 0, size // RECORD_SIZE)
+            file.seek(0)
+            offset = _HEADER.size
+            while True:
+                data = file.read(chunk_size * RECORD_SIZE)
+                if not data:
+                    break
+                memory.buf[offset:offset + len(data)] = data
+                offset += len(data)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name), owner=False)
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        # the owner also removes the block, workers that are still attached keep their mapping
+        if self._memory is None:
+            return
+        self.records.release()
+        self.records = []
+        self._memory.close()
+        if self.owner:
+            self._memory.unlink()
+        self._memory = None
+
+
+class TablebaseStore:
+    # an evaluation store that probes a table first, positions outside the table are kept in a local store
+    def __init__(self, table, local=None):
+        self.table = table
+        self.local = local if local is not None else main.EvaluationStore()
+        self.statistics = self.local.statistics
+        self.probes = 0
+        self.table_hits = 0
+
+    def save(self, position, evaluation, work=1, ply=0, terminal=False):
+        self.local.save(position, evaluation, work, ply, terminal)
+
+    def __getitem__(self, position):
+        self.probes += 1
+        result = self.table.probe(position.code)
+        if result is not None:
+            self.table_hits += 1
+            return result
+        return self.local[position]
+
+    def print_stats(self):
+        print(f"Tablebase store: {len(self.table)} records, probes={self.probes} table hits={self.table_hits}")
+        self.local.print_stats()
+
+
+_table = None
+
+
+def use_shared_tablebase(name):
+    # worker initializer: attaches to the shared table and makes it the evaluation store of this process
+    global _table
+    _table = SharedTablebase.attach(name)
+    main.evaluation_store = TablebaseStore(_table)
+    return main.evaluation_store
@@ -0,0 +1,112 @@
+from timeit import default_timer as timer
+import argparse
+import sqlite3
+from basics import *
+from notation import split_code
+
+# Exporting solved positions to SQLite for ad-hoc queries, e.g. all two-pawn draws with black to play:
+#
+#     SELECT * FROM positions WHERE nb_pawns = 2 AND player = 'b' AND result = '='
+#
+# One row per position with a column per file (the rank of its pawn, 0 for none), the queen square, the player,
+# the result ('+', '=' or '-' for the player to move), the number of pawns, the highest pawn rank and
+# the distance to the end (NULL if unknown, the tablebases and stores do not keep it).
+# The code is the primary key, so exporting a position again replaces its row.
+# Rows are inserted in batches in one transaction, the indexes are created afterwards.
+#
+#     python sqlite_export.py table.bin positions.sqlite
+#     sqlite3 positions.sqlite "SELECT result, count(*) FROM positions WHERE nb_pawns = 2 GROUP BY result"
+
+RESULT_TEXT = {Status.WIN: "+", Status.DRAW: "=", Status.LOSE: "-"}
+PLAYER_TEXT = {Player.WHITE: "w", Player.BLACK: "b"}
+PAWN_COLUMNS = [f"pawn_{letter}" for letter in FILE_LETTERS]
+COLUMNS = PAWN_COLUMNS + ["queen", "queen_file", "queen_rank", "player", "result", "nb_pawns", "highest_rank",
+                          "distance", "code"]
+INDEXES = {
+    "layer": ["nb_pawns", "player", "result"],
+    "queen": ["queen", "player", "result"],
+    "highest_rank": ["highest_rank", "player", "result"],
+}
+
+
+def create_table(connection):
+    pawns = ", ".join(f"{column} INTEGER NOT NULL" for column in PAWN_COLUMNS)
+    connection.execute(f"CREATE TABLE IF NOT EXISTS positions ({pawns}, queen TEXT NOT NULL, "
+                       f"queen_file INTEGER NOT NULL, queen_rank INTEGER NOT NULL, player TEXT NOT NULL, "
+                       f"result TEXT NOT NULL, nb_pawns INTEGER NOT NULL, highest_rank INTEGER NOT NULL, "
+                       f"distance INTEGER, code INTEGER PRIMARY KEY)")
+
+
+def create_indexes(connection, columns_per_pawn=True):
+    for name, columns in INDEXES.items():
+        connection.execute(f"CREATE INDEX IF NOT EXISTS positions_{name} ON positions ({', '.join(columns)})")
+    if columns_per_pawn:
+        for column in PAWN_COLUMNS:
+            connection.execute(f"CREATE INDEX IF NOT EXISTS positions_{column} ON positions ({column}, nb_pawns)")
+
+
+def row(code, result, distance=None):
+    pawn_ranks, queen_file, queen_rank, player = split_code(code)
+    nb_pawns = sum(1 for rank in pawn_ranks if rank)
+    return (*pawn_ranks, FILE_LETTERS[queen_file - 1] + str(queen_rank), queen_file, queen_rank,
+            PLAYER_TEXT[player], RESULT_TEXT[result], nb_pawns, max(pawn_ranks), distance, code)
+
+
+def export(items, path, batch_size=50000, columns_per_pawn=True, report=print):
+    # Writes items, (code, result) or (code, result, distance), to the database at path, returns the number of rows.
+    # Rows of other positions are kept, so several sources can be exported into one database.
+    start = timer()
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        create_table(connection)
+        insert = f"INSERT OR REPLACE INTO positions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        count = 0
+        batch = []
+        with connection:
+            for item in items:
+                if item[1] is None:
+                    continue
+                batch.append(row(*item))
+                if len(batch) == batch_size:
+                    connection.executemany(insert, batch)
+                    count += len(batch)
+                    batch = []
+            connection.executemany(insert, batch)
+            count += len(batch)
+        with connection:
+            create_indexes(connection, columns_per_pawn)
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+    if report:
+        report(f"{count} positions exported to {path} in {timer() - start:.2f}s")
+    return count
+
+
+def store_items(store, max_pawns=NB_FILES):
+    # (code, result) of all positions in an EvaluationStore
+    for p in Player:
+        for n in range(max_pawns + 1):
+            yield from store.items(p, n)
+
+
+def export_tablebase(table_path, path, **kwargs):
+    from tablebase import Tablebase
+    with Tablebase(table_path) as table:
+        return export(table.items(), path, **kwargs)
+
+
+def export_store(store, path, max_pawns=NB_FILES, **kwargs):
+    return export(store_items(store, max_pawns), path, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a tablebase file to SQLite")
+    parser.add_argument("table", help="tablebase file")
+    parser.add_argument("output", help="SQLite database, rows are added or replaced if it exists")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--no-pawn-indexes", action="store_true", help="skip the index per pawn column")
+    args = parser.parse_args()
+    export_tablebase(args.table, args.output, batch_size=args.batch_size, columns_per_pawn=not args.no_pawn_indexes)
@@ -0,0 +1,316 @@
+from array import array
+from itertools import combinations, product
+from math import comb
+from timeit import default_timer as timer
+import argparse
+import os
+import shutil
+import tempfile
+from basics import *
+from main import PAWN_BITS, QUEEN_SHIFT, PLAYER_SHIFT
+from notation import RESULT_TYPECODE
+from evaluation_statistics import EvaluationStatistics
+from tablebase import write_run, merge_runs
+
+# Solving all positions by sweeping over pawn configurations.
+#
+# A pawn configuration gives the rank of the pawn in each file (0 for no pawn). A white move pushes a pawn,
+# a black move keeps the configuration or captures a pawn. So the configuration progresses with every
+# move, except for black moves without capture. We solve the configurations in reverse topological order:
+#   - layers with fewer pawns first
+#   - within a layer, the highest sum of pawn ranks first
+# and for one configuration first white to play (pawn pushes go to configurations that are solved already),
+# then black to play (non-capturing moves need the white-to-play positions of the same configuration,
+# captures need a configuration of the previous layer).
+#
+# Sliding window: a configuration D with k - 1 pawns is only needed by configurations with k pawns and
+# a sum of ranks at least sum(D) + 2 (D plus a pawn of at least rank 2). So once the sweep of layer k
+# reaches sum s, the configurations of layer k - 1 with a sum of at least s - 1 are written to disk and
+# dropped. Peak memory is about two layers of configurations, instead of the whole table.
+#
+# The results of each configuration are bytearrays indexed by queen square with values
+NOT_VALID, LOSE, DRAW, WIN = 0, 1, 2, 3
+# (minus one gives the result bits of notation.py). The result is a tablebase file (see tablebase.py).
+
+NB_SQUARES = NB_FILES * NB_RANKS
+WHITE, BLACK = 0, 1
+
+
+def _square_index(file, rank):
+    return (file - 1) + (rank - 1) * NB_FILES
+
+
+def _generate_rays():
+    # rays[square] is the list of rays of a queen on square, each a list of square indices
+    rays = [[] for _ in range(NB_SQUARES)]
+    for square in BOARD.squares:
+        for d in Direction:
+            df, dr = DirectionVector[d.name].value
+            f, r = square.file + df, square.rank + dr
+            ray = []
+            while f in FILES and r in RANKS:
+                ray.append(_square_index(f, r))
+                f, r = f + df, r + dr
+            if ray:
+                rays[square.index].append(ray)
+    return rays
+
+
+RAYS = _generate_rays()
+
+
+def configuration_code(config):
+    code = 0
+    for i, rank in enumerate(config):
+        if rank:
+            code |= (rank - 1) << (PAWN_BITS * i)
+    return code
+
+
+def configurations_in_files(files):
+    # all configurations with pawns in exactly these files, at most one promoted, the highest sum of ranks first
+    result = []
+    for ranks in product(RANKS[1:], repeat=len(files)):
+        if ranks.count(PROMOTION_RANK) <= 1:
+            config = [0] * NB_FILES
+            for f, r in zip(files, ranks):
+                config[f - 1] = r
+            result.append(tuple(config))
+    result.sort(key=sum, reverse=True)
+    return result
+
+
+def configurations(nb_pawns):
+    # all configurations with nb_pawns pawns, the highest sum of ranks first
+    result = []
+    for files in combinations(FILES, nb_pawns):
+        result.extend(configurations_in_files(files))
+    result.sort(key=sum, reverse=True)
+    return result
+
+
+def configuration_count(nb_pawns):
+    # len(configurations(nb_pawns)): pawns on the ranks below promotion, or one of them promoted
+    m = NB_RANKS - 2
+    return comb(NB_FILES, nb_pawns) * (m ** nb_pawns + nb_pawns * m ** max(nb_pawns - 1, 0))
+
+
+def configuration_records(config, results):
+    # yields the result records (see notation.py) of the valid positions in the results of config
+    pawns_code = configuration_code(config)
+    for player, values in enumerate(results):
+        if values is None:
+            continue
+        base = pawns_code | (player << PLAYER_SHIFT)
+        for q, value in enumerate(values):
+            if value != NOT_VALID:
+                yield ((base | (q << QUEEN_SHIFT)) << 2) | (value - 1)
+
+
+def solve_configuration(config, get_results):
+    # returns the (white, black) results of config, get_results(c) gives them for solved configurations
+    nb_pawns = NB_FILES - config.count(0)
+    occupied = set()
+    attacked = set()
+    for f, r in enumerate(config, 1):
+        if r:
+            occupied.add(_square_index(f, r))
+            if r < PROMOTION_RANK:
+                if f > 1:
+                    attacked.add(_square_index(f - 1, r + 1))
+                if f < NB_FILES:
+                    attacked.add(_square_index(f + 1, r + 1))
+    promoted = PROMOTION_RANK in config
+
+    white = None
+    if not promoted:
+        white = bytearray(NB_SQUARES)
+        # moves: the black results after the push and the squares the queen must not be on for that push
+        moves = []
+        for f, r in enumerate(config, 1):
+            if r:
+                pushed = list(config)
+                pushed[f - 1] = r + 1
+                moves.append((get_results(tuple(pushed))[BLACK], (_square_index(f, r + 1),)))
+                if r == 2:
+                    pushed[f - 1] = r + 2
+                    moves.append((get_results(tuple(pushed))[BLACK],
+                                  (_square_index(f, r + 1), _square_index(f, r + 2))))
+        for q in range(NB_SQUARES):
+            if q in occupied or q in attacked:
+                continue
+            if nb_pawns == 0:
+                white[q] = LOSE
+                continue
+            best = LOSE
+            has_move = False
+            for child, blocked in moves:
+                if q in blocked:
+                    continue
+                has_move = True
+                value = child[q]
+                if value == LOSE:
+                    best = WIN
+                    break
+                if value == DRAW:
+                    best = DRAW
+            white[q] = best if has_move else DRAW
+
+    black = None
+    if nb_pawns > 0:
+        black = bytearray(NB_SQUARES)
+        captured = {}  # captured[square] is the white results after capturing the pawn on square
+        for f, r in enumerate(config, 1):
+            if r:
+                without = list(config)
+                without[f - 1] = 0
+                captured[_square_index(f, r)] = get_results(tuple(without))[WHITE]
+        for q in range(NB_SQUARES):
+            if q in occupied:
+                continue
+            if promoted:
+                black[q] = LOSE
+                continue
+            best = LOSE
+            for ray in RAYS[q]:
+                for square in ray:
+                    if square not in attacked:
+                        value = captured[square][square] if square in occupied else white[square]
+                        if value == LOSE:
+                            best = WIN
+                            break
+                        if value == DRAW:
+                            best = DRAW
+                    if square in occupied:
+                        break
+                if best == WIN:
+                    break
+            black[q] = best
+    return white, black
+
+
+def add_statistics(statistics, config, results):
+    for player, values in zip((Player.WHITE, Player.BLACK), results):
+        if values is not None and values.count(NOT_VALID) < len(values):
+            statistics.add_counts(player, config, values.count(LOSE), values.count(DRAW), values.count(WIN))
+
+
+class SweepSolver:
+    def __init__(self, directory=None, max_pawns=NB_FILES, run_size=1 << 22, report=print, progress=None,
+                 budget=None):
+        self.directory = directory
+        self.max_pawns = max_pawns
+        self.run_size = run_size
+        self.report = report
+        self.results = {}  # results[config] == (white, black) for the configurations in memory
+        self.resident = {}  # resident[nb_pawns, sum of ranks] is the list of those configurations in memory
+        self.runs = []
+        self.buffer = array(RESULT_TYPECODE)
+        self.positions = 0
+        self.peak_resident = 0
+        self.statistics = EvaluationStatistics()
+        self.progress = progress  # see progress.py, layers are the numbers of pawns, work the configurations
+        self.budget = budget  # see memory_budget.py, the buffer is spilled near the budget
+
+    def get_results(self, config):
+        return self.results[config]
+
+    def solve(self, path):
+        # solves all positions with at most max_pawns pawns into the tablebase file at path
+        start = timer()
+        own_directory = self.directory is None
+        directory = tempfile.mkdtemp(prefix="sweep_") if own_directory else self.directory
+        try:
+            for nb_pawns in range(self.max_pawns + 1):
+                layer_start = timer()
+                configs = configurations(nb_pawns)
+                if self.progress:
+                    self.progress.start_layer(nb_pawns)
+                for i, config in enumerate(configs):
+                    s = sum(config)
+                    if i == 0 or s != sum(configs[i - 1]):
+                        self._evict_layer(directory, nb_pawns - 1, minimum_sum=s - 1)
+                    self.results[config] = solve_configuration(config, self.get_results)
+                    self.resident.setdefault((nb_pawns, s), []).append(config)
+                    self.peak_resident = max(self.peak_resident, len(self.results))
+                    if self.progress:
+                        self.progress.advance()
+                    if self.budget is not None and self.budget.tick():
+                        self._spill(directory)
+                self._evict_layer(directory, nb_pawns - 1)
+                if self.progress:
+                    self.progress.finish_layer()
+                if self.report:
+                    self.report(f"layer {nb_pawns}: {len(configs)} configurations in {timer() - layer_start:.2f}s, "
+                                f"{len(self.results)} in memory")
+            self._evict_layer(directory, self.max_pawns)
+            self._flush(directory)
+            count = merge_runs(self.runs, path)
+        finally:
+            if own_directory:
+                shutil.rmtree(directory, ignore_errors=True)
+            else:
+                for run in self.runs:
+                    os.remove(run)
+            self.runs = []
+        if self.report:
+            self.report(f"{count} positions written to {path} in {timer() - start:.2f}s, "
+                        f"at most {self.peak_resident} configurations in memory")
+        return count
+
+    def _evict_layer(self, directory, nb_pawns, minimum_sum=0):
+        for key in [k for k in self.resident if k[0] == nb_pawns and k[1] >= minimum_sum]:
+            for config in self.resident.pop(key):
+                self._write(config, self.results.pop(config))
+                if len(self.buffer) >= self.run_size:
+                    self._flush(directory)
+
+    def _write(self, config, results):
+        size = len(self.buffer)
+        self.buffer.extend(configuration_records(config, results))
+        self.positions += len(self.buffer) - size
+        add_statistics(self.statistics, config, results)
+
+    def _spill(self, directory):
+        from memory_budget import account
+        if self.report:
+            self.report(f"spilling {len(self.buffer)} records near the memory budget")
+        self._flush(directory)
+        self.budget.after_reaction(account(solver=self))
+
+    def _flush(self, directory):
+        if len(self.buffer) > 0:
+            path = os.path.join(directory, f"run_{len(self.runs):05d}.bin")
+            write_run(path, self.buffer)
+            self.runs.append(path)
+            self.buffer = array(RESULT_TYPECODE)
+
+
+def make_progress(max_pawns, status_path=None):
+    from progress import Progress
+    return Progress({n: configuration_count(n) for n in range(max_pawns + 1)}, "configurations", status_path)
+
+
+def make_budget(memory_limit_in_mib):
+    if memory_limit_in_mib is None:
+        return None
+    from memory_budget import MemoryBudget
+    return MemoryBudget(memory_limit_in_mib << 20, check_every=100)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve all positions by sweeping over pawn configurations")
+    parser.add_argument("output", help="tablebase file")
+    parser.add_argument("--max-pawns", type=int, default=NB_FILES)
+    parser.add_argument("--directory", help="directory for the evicted runs (default: a temporary directory)")
+    parser.add_argument("--run-size", type=int, default=1 << 22, help="records per run")
+    parser.add_argument("--statistics", help="write the W/D/L statistics to this CSV or JSON file")
+    parser.add_argument("--status", help="write the progress to this JSON file")
+    parser.add_argument("--memory-limit", type=int, help="memory budget in MiB")
+    args = parser.parse_args()
+
+    solver = SweepSolver(args.directory, args.max_pawns, args.run_size,
+                         progress=make_progress(args.max_pawns, args.status), budget=make_budget(args.memory_limit))
+    solver.solve(args.output)
+    if args.statistics:
+        solver.statistics.write(args.statistics)
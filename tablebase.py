@@ -0,0 +1,102 @@
+from array import array
+from bisect import bisect_left
+import heapq
+import mmap
+import os
+from basics import *
+from notation import RESULT_TYPECODE, decode_result, read_results
+
+# Tablebase files: solved positions as a sorted array of result records (code * 4 + result, see notation.py),
+# in native byte order. As the code is in the high bits, the records are sorted by code, so
+#   - a position is found by binary search, directly in the memory-mapped file
+#   - two files are compared by walking them side by side
+#
+# Solvers write sorted runs and merge them at the end, so they never hold the whole table in memory.
+
+RECORD_SIZE = array(RESULT_TYPECODE).itemsize
+
+
+def write_run(path, records):
+    # sorts records (an array of RESULT_TYPECODE) and writes it as one file
+    records = array(RESULT_TYPECODE, sorted(records))
+    with open(path, "wb") as file:
+        records.tofile(file)
+    return len(records)
+
+
+def iterate_records(path, chunk_size=1 << 16):
+    with open(path, "rb") as file:
+        for records in read_results(file, chunk_size):
+            yield from records
+
+
+def merge_runs(run_paths, path, chunk_size=1 << 16):
+    # merges sorted runs into the tablebase file at path, returns the number of records
+    count = 0
+    buffer = array(RESULT_TYPECODE)
+    with open(path, "wb") as file:
+        for record in heapq.merge(*[iterate_records(run, chunk_size) for run in run_paths]):
+            buffer.append(record)
+            if len(buffer) == chunk_size:
+                buffer.tofile(file)
+                count += len(buffer)
+                buffer = array(RESULT_TYPECODE)
+        buffer.tofile(file)
+        count += len(buffer)
+    return count
+
+
+class SortedRecords:
+    # lookups in self.records, a sequence of sorted result records (see shared_tablebase.py for another one)
+    records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def lower_bound(self, code):
+        # the index of the first record with at least code
+        return bisect_left(self.records, code << 2)
+
+    def probe(self, code):
+        # the evaluation of the position with code, None if it is not in the table
+        i = self.lower_bound(code)
+        if i < len(self.records) and self.records[i] >> 2 == code:
+            return decode_result(self.records[i])[1]
+        return None
+
+    def __getitem__(self, position):
+        return self.probe(position.code)
+
+    def items(self):
+        # yields (code, evaluation) in code order
+        for record in self.records:
+            yield decode_result(record)
+
+
+class Tablebase(SortedRecords):
+    # read-only access to a tablebase file, without loading it
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        assert size % RECORD_SIZE == 0, f"not a tablebase file: {path}"
+        if size == 0:
+            self._mmap = None
+            self.records = []
+        else:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.records = memoryview(self._mmap).cast(RESULT_TYPECODE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            self.records.release()
+            self._mmap.close()
+            self._mmap = None
+            self.records = []
+        self._file.close()
@@ -0,0 +1,180 @@
+from collections import defaultdict
+from time import perf_counter_ns
+import main
+from main import Position, PosWhite, PosBlack
+from basics import *
+
+# Opt-in tracing of the search: Position.evaluate, the move generators and the store lookups.
+#
+# enable() replaces these methods (and the evaluation store) by timing wrappers, disable() puts the originals
+# back, so tracing costs nothing when it is disabled. Sampling is per call tree: of the calls that are not
+# made from a traced method, one in sample_every is traced with everything it calls, the others run untimed.
+#
+# Each traced call is a frame labelled with the method, the player and the number of pawns, e.g.
+# "evaluate[b2]" or "store.get[w1]". Times are aggregated per label (calls, total and self time)
+# and per stack of labels in the collapsed format of flamegraph.pl and speedscope, in microseconds:
+#     evaluate[w2];evaluate[b2];generate_moves[b2] 153
+#
+# Usage (single thread):
+#     tracer = enable(sample_every=10)
+#     ...
+#     disable()
+#     tracer.print_stats()
+#     tracer.write_collapsed("search.folded")       flamegraph.pl search.folded > search.svg
+
+TRACED_METHODS = {
+    Position: ["evaluate"],
+    PosWhite: ["generate_moves", "generate_next_positions", "generate_prev_positions"],
+    PosBlack: ["generate_moves", "generate_next_positions", "generate_prev_positions"],
+}
+GENERATORS = {"generate_moves", "generate_next_positions", "generate_prev_positions"}
+
+
+def frame_label(name, position):
+    return f"{name}[{'w' if position.player() == Player.WHITE else 'b'}{position.pawns.count()}]"
+
+
+class Tracer:
+    def __init__(self, sample_every=1):
+        assert sample_every >= 1
+        self.sample_every = sample_every
+        self.roots = 0  # calls not made from a traced method
+        self.untraced_depth = 0
+        self.stack = []  # frames [label, start, time in children]
+        self.calls = defaultdict(int)  # calls[label]
+        self.total_ns = defaultdict(int)  # total_ns[label], including children
+        self.self_ns = defaultdict(int)  # self_ns[label]
+        self.collapsed = defaultdict(int)  # collapsed[stack of labels] == self time in ns
+
+    def start(self):
+        # True if the call should be traced
+        if self.stack:
+            return True
+        if self.untraced_depth:
+            return False
+        self.roots += 1
+        return self.roots % self.sample_every == 0
+
+    def enter(self, label):
+        self.stack.append([label, perf_counter_ns(), 0])
+
+    def exit(self):
+        label, start, children = self.stack[-1]
+        elapsed = perf_counter_ns() - start
+        self.calls[label] += 1
+        self.total_ns[label] += elapsed
+        self.self_ns[label] += elapsed - children
+        self.collapsed[";".join(frame[0] for frame in self.stack)] += elapsed - children
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def call(self, function, name, position, *args):
+        # function(position, *args)
+        if not self.start():
+            self.untraced_depth += 1
+            try:
+                return function(position, *args)
+            finally:
+                self.untraced_depth -= 1
+        self.enter(frame_label(name, position))
+        try:
+            return function(position, *args)
+        finally:
+            self.exit()
+
+    def iterate(self, iterator, name, position):
+        # times each step of a generator, the consumer runs in between
+        while True:
+            if not self.start():
+                self.untraced_depth += 1
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.untraced_depth -= 1
+            else:
+                self.enter(frame_label(name, position))
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.exit()
+            yield item
+
+    def rows(self):
+        # (method, player and pawns, calls, total ms, self ms), the highest self time first
+        for label in sorted(self.calls, key=lambda k: -self.self_ns[k]):
+            name, layer = label[:-1].split("[")
+            yield name, layer, self.calls[label], self.total_ns[label] / 1e6, self.self_ns[label] / 1e6
+
+    def print_stats(self, limit=20):
+        print(f"Traced {self.roots // self.sample_every} of {self.roots} call trees (1 in {self.sample_every})")
+        print(f"  {'method':<26}{'layer':>6}{'calls':>10}{'total ms':>12}{'self ms':>12}{'self us/call':>14}")
+        for i, (name, layer, calls, total_ms, self_ms) in enumerate(self.rows()):
+            if i == limit:
+                break
+            print(f"  {name:<26}{layer:>6}{calls:>10}{total_ms:>12.1f}{self_ms:>12.1f}{1000 * self_ms / calls:>14.2f}")
+
+    def write_collapsed(self, path):
+        with open(path, "w") as file:
+            for stack, ns in sorted(self.collapsed.items()):
+                if ns >= 1000:
+                    file.write(f"{stack} {ns // 1000}\n")
+
+
+class TracingStore:
+    # times the lookups and saves of the evaluation store it wraps
+    def __init__(self, store, tracer):
+        self.store = store
+        self.tracer = tracer
+
+    def __getitem__(self, position):
+        return self.tracer.call(self.store.__getitem__, "store.get", position)
+
+    def save(self, position, evaluation, work=1, ply=0, terminal=False):
+        self.tracer.call(self.store.save, "store.save", position, evaluation, work, ply, terminal)
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+
+def _wrap(tracer, name, method):
+    if name in GENERATORS:
+        def traced(self, *args):
+            return tracer.iterate(method(self, *args), name, self)
+    else:
+        def traced(self, *args):
+            return tracer.call(method, name, self, *args)
+    traced.__wrapped__ = method
+    return traced
+
+
+_tracer = None
+
+
+def enable(sample_every=1):
+    global _tracer
+    disable()
+    _tracer = Tracer(sample_every)
+    for cls, names in TRACED_METHODS.items():
+        for name in names:
+            setattr(cls, name, _wrap(_tracer, name, cls.__dict__[name]))
+    main.evaluation_store = TracingStore(main.evaluation_store, _tracer)
+    return _tracer
+
+
+def disable():
+    # restores the methods and the store, returns the tracer with the results
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return None
+    for cls, names in TRACED_METHODS.items():
+        for name in names:
+            setattr(cls, name, cls.__dict__[name].__wrapped__)
+    if isinstance(main.evaluation_store, TracingStore):
+        main.evaluation_store = main.evaluation_store.store
+    return tracer
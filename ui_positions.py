@@ -1,7 +1,4 @@
-from pyscreenshot import grab
-from tkinter import ttk
-import tkinter as tk
-from chess_board_frame import Board
+from diagram_renderer import parse_position_string
 
 positions = ["a2, b2, c2, d2, e2, f2, g2, h2, Qd8  # initial position",
              "d4, Qc6, ad5, bd6, ce4, de6  # queen can avoid being captured",
@@ -51,10 +48,10 @@ positions = ["a2, b2, c2, d2, e2, f2, g2, h2, Qd8  # initial position",
              "b6, d5, f5, Qg3"
              ]
 
-root = tk.Tk()
-
 
 def create_image():
+    from pyscreenshot import grab
+
     filename = "position.png"
     f = 1.25
     print(board_frame.winfo_width())
@@ -74,6 +71,8 @@ def create_image():
 
 
 def create_image_small():
+    from pyscreenshot import grab
+
     filename = "position.png"
     f = 1.25
     img = grab(bbox=(
@@ -90,17 +89,10 @@ def create_image_small():
 
 
 def show(pos_str):
-    if "#" in pos_str:
-        title.configure(text=pos_str.split("#")[1].strip())
-        pos_str = pos_str.split("#")[0]
-    else:
-        title.configure(text="")
+    title_text, items = parse_position_string(pos_str)
+    title.configure(text=title_text)
     board_frame.clear()
-    for square in pos_str.split(","):
-        square = square.strip()
-        character = square[:-2]
-        file = "abcdefgh".find(square[-2]) + 1
-        rank = int(square[-1])
+    for character, file, rank in items:
         if character == "Q":
             board_frame.set_black_queen(file, rank)
         elif character == "":
@@ -121,22 +113,29 @@ def show_prev():
     show(positions[0])
 
 
-title = tk.Label(root, text="title")
-title.grid(column=1, row=0)
-board_frame = Board(root, lambda x: None)
-board_frame.grid(column=1, row=1)
+if __name__ == "__main__":
+    from tkinter import ttk
+    import tkinter as tk
+    from chess_board_frame import Board
 
-turn_frame = tk.Frame(root)  # their units in pixels
-turn_frame.grid(column=2, row=1)
+    root = tk.Tk()
+    title = tk.Label(root, text="title")
+    title.grid(column=1, row=0)
+    board_frame = Board(root, lambda x: None)
+    board_frame.grid(column=1, row=1)
 
-ttk.Button(turn_frame, text="Prev", command=show_prev).grid(column=1, row=1, sticky="E", padx=10, pady=10)
-ttk.Button(turn_frame, text="Next", command=show_next).grid(column=1, row=2, sticky="E", padx=10, pady=10)
-ttk.Button(turn_frame, text="Capture all", command=create_image).grid(column=1, row=3, sticky="E", padx=10, pady=10)
-ttk.Button(turn_frame, text="Capture part", command=create_image_small).grid(column=1, row=4, sticky="E", padx=10,
-                                                                             pady=10)
+    turn_frame = tk.Frame(root)  # their units in pixels
+    turn_frame.grid(column=2, row=1)
 
-ttk.Button(root, text="Quit", command=root.destroy).grid(column=2, row=2, sticky="E", padx=10, pady=10)
+    ttk.Button(turn_frame, text="Prev", command=show_prev).grid(column=1, row=1, sticky="E", padx=10, pady=10)
+    ttk.Button(turn_frame, text="Next", command=show_next).grid(column=1, row=2, sticky="E", padx=10, pady=10)
+    ttk.Button(turn_frame, text="Capture all", command=create_image).grid(column=1, row=3, sticky="E", padx=10,
+                                                                          pady=10)
+    ttk.Button(turn_frame, text="Capture part", command=create_image_small).grid(column=1, row=4, sticky="E",
+                                                                                 padx=10, pady=10)
 
-show(positions[0])
+    ttk.Button(root, text="Quit", command=root.destroy).grid(column=2, row=2, sticky="E", padx=10, pady=10)
+
+    show(positions[0])
 
-root.mainloop()
+    root.mainloop()
@@ -0,0 +1,242 @@
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from timeit import default_timer as timer
+import argparse
+import hashlib
+import os
+import sys
+from basics import *
+from main import QUEEN_SHIFT, QUEEN_BITS, PLAYER_SHIFT
+from notation import decode_result, code_to_text, split_code, RESULT_CHARACTERS
+from sweep_solver import NB_SQUARES, NOT_VALID, LOSE, DRAW, WIN, WHITE, BLACK, configuration_code, \
+    configurations_in_files, solve_configuration
+from tablebase import Tablebase
+
+# Verifying tablebase files (see tablebase.py) built by other engines.
+#
+# Every entry is checked against its children, with the same rules as Position.evaluate:
+#   - a position lost by definition (is_lost_by_definition) is a LOSE
+#   - a position without moves is a DRAW
+#   - otherwise a WIN has a LOSE child, a LOSE has only WIN children, a DRAW has no LOSE child and a DRAW child
+# The game graph has no cycles (every white move advances a pawn), so the local rules and the positions
+# without moves fix the value of every position: a complete table that satisfies them is the solution.
+#
+# The table is walked per pawn configuration, like sweep_solver.py: the results of a configuration are read
+# for all queen squares, recomputed by solve_configuration from the results of its children in the table,
+# and compared square by square, so missing and invalid positions are found too. A unit of work is a subset
+# of files (all configurations with pawns in exactly these files), units are verified in parallel.
+# Within a unit the configurations are read in order of decreasing sum of ranks and kept while pushes
+# can reach them. Records outside the configurations with at most max_pawns pawns are counted by comparing
+# the number of records read with the size of the table.
+#
+# For comparing tables, the table is split in segments by player and queen square (the highest bits of
+# the code), each a contiguous part of the file with a checksum. Two tables are compared per segment first
+# and only differing segments are compared position by position.
+#
+#     python verifier.py table.bin
+#     python verifier.py table.bin --diff other.bin
+
+NB_SEGMENTS = 2 << QUEEN_BITS
+_STATUS_OF_VALUE = {LOSE: Status.LOSE, DRAW: Status.DRAW, WIN: Status.WIN}
+
+
+def segment_of(code):
+    return code >> QUEEN_SHIFT
+
+
+def segment_bounds(table, segment):
+    # the range of the indices of the records of segment
+    return table.lower_bound(segment << QUEEN_SHIFT), table.lower_bound((segment + 1) << QUEEN_SHIFT)
+
+
+def nb_pawns(code):
+    return sum(1 for rank in split_code(code)[0] if rank)
+
+
+def max_pawns_of(table):
+    # The most pawns in the table, from the segment of black to play with the queen on a1: a1 is never
+    # occupied, so every configuration with black to play has a position there.
+    start, end = segment_bounds(table, 1 << QUEEN_BITS)
+    return max((nb_pawns(table.records[i] >> 2) for i in range(start, end)), default=0)
+
+
+def read_configuration(records, bounds, config):
+    # The (white, black) values of config in records like sweep_solver, NOT_VALID for a position not in records.
+    # bounds[segment] are the segment bounds, the positions of a configuration are one per segment.
+    pawns_code = configuration_code(config)
+    result = []
+    for player in (WHITE, BLACK):
+        values = bytearray(NB_SQUARES)
+        first = player << QUEEN_BITS
+        for q in range(NB_SQUARES):
+            start, end = bounds[first + q]
+            key = (pawns_code | ((first + q) << QUEEN_SHIFT)) << 2
+            i = bisect_left(records, key, start, end)
+            if i < end and records[i] >> 2 == key >> 2:
+                values[q] = (records[i] & 3) + 1
+        result.append(values)
+    return result
+
+
+def verify_unit(path, files, max_failures=100):
+    # returns (number of records read, failures) of the configurations with pawns in exactly files,
+    # failures are (code, result in the table, expected result), the result is None for a missing position
+    # and "?" for an unknown result, the expected result "invalid" for a position that should not be in the table
+    failures = []
+    nb_records = 0
+    with Tablebase(path) as table:
+        records = table.records
+        bounds = [segment_bounds(table, segment) for segment in range(NB_SEGMENTS)]
+        window = {}  # the values of configurations of the unit, read in order of decreasing sum of ranks
+        order = deque()
+        others = {}  # the values of configurations of other units (captures)
+
+        def get_results(c):
+            values = window.get(c, None)
+            if values is None:
+                values = others.get(c, None)
+                if values is None:
+                    values = others[c] = read_configuration(records, bounds, c)
+            return values
+
+        for config in configurations_in_files(files):
+            while order and sum(order[0]) > sum(config) + 2:  # pushes add one or two ranks
+                del window[order.popleft()]
+            found = window[config] = read_configuration(records, bounds, config)
+            order.append(config)
+            expected = solve_configuration(config, get_results)
+            pawns_code = configuration_code(config)
+            for player in (WHITE, BLACK):
+                values = found[player]
+                nb_records += NB_SQUARES - values.count(NOT_VALID)
+                computed = expected[player] if expected[player] is not None else bytearray(NB_SQUARES)
+                if computed == values:
+                    continue
+                for q in range(NB_SQUARES):
+                    if computed[q] != values[q] and len(failures) < max_failures:
+                        code = pawns_code | (q << QUEEN_SHIFT) | (player << PLAYER_SHIFT)
+                        result = None if values[q] == NOT_VALID else _STATUS_OF_VALUE.get(values[q], "?")
+                        failures.append((code, result, _STATUS_OF_VALUE.get(computed[q], "invalid")))
+    return nb_records, failures
+
+
+def _verify_unit_job(job):
+    return verify_unit(*job)
+
+
+def _checksum_job(job):
+    path, segment = job
+    with Tablebase(path) as table:
+        start, end = segment_bounds(table, segment)
+        if end == start:
+            return hashlib.blake2b(b"", digest_size=16).hexdigest()
+        records = table.records[start:end]
+        checksum = hashlib.blake2b(records.tobytes(), digest_size=16).hexdigest()
+        records.release()
+    return checksum
+
+
+def _map(function, jobs, processes):
+    if processes == 1:
+        return [function(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(function, jobs))
+
+
+def verify(path, processes=None, max_failures=100, max_pawns=None, report=print):
+    # Returns (failures, number of records outside the configurations with at most max_pawns pawns),
+    # max_pawns is by default the most pawns in the table.
+    start = timer()
+    with Tablebase(path) as table:
+        nb_table = len(table)
+        if max_pawns is None:
+            max_pawns = max_pawns_of(table)
+    units = [files for n in range(min(max_pawns, NB_FILES) + 1) for files in combinations(FILES, n)]
+    units.reverse()  # the largest units first, for an even load
+    results = _map(_verify_unit_job, [(path, files, max_failures) for files in units], processes)
+    failures = sorted(failure for _, unit_failures in results for failure in unit_failures)[:max_failures]
+    nb_read = sum(n for n, _ in results)
+    nb_unexpected = nb_table - nb_read
+    if report:
+        for code, result, expected in failures:
+            if result is None:
+                report(f"{code_to_text(code)}: missing from the table, expected {RESULT_CHARACTERS[expected]}")
+            else:
+                report(f"{code_to_text(code)}: {RESULT_CHARACTERS.get(result, result)} in table, expected "
+                       f"{RESULT_CHARACTERS[expected] if isinstance(expected, Status) else expected}")
+        if nb_unexpected:
+            report(f"{nb_unexpected} records are not positions with at most {max_pawns} pawns")
+        report(f"{path}: {nb_read} positions with at most {max_pawns} pawns verified in {timer() - start:.2f}s, "
+               f"{len(failures)} failures")
+    return failures, nb_unexpected
+
+
+def checksums(path, processes=None):
+    return _map(_checksum_job, [(path, s) for s in range(NB_SEGMENTS)], processes)
+
+
+def diff(path_a, path_b, processes=None, max_differences=100):
+    # returns the list of (code, result in a, result in b) where they differ, None if the code is missing
+    differences = []
+    segments = [s for s, (a, b) in enumerate(zip(checksums(path_a, processes), checksums(path_b, processes)))
+                if a != b]
+    with Tablebase(path_a) as table_a, Tablebase(path_b) as table_b:
+        for segment in segments:
+            start_a, end_a = segment_bounds(table_a, segment)
+            start_b, end_b = segment_bounds(table_b, segment)
+            i, j = start_a, start_b
+            while (i < end_a or j < end_b) and len(differences) < max_differences:
+                code_a, result_a = decode_result(table_a.records[i]) if i < end_a else (None, None)
+                code_b, result_b = decode_result(table_b.records[j]) if j < end_b else (None, None)
+                if code_b is None or (code_a is not None and code_a < code_b):
+                    differences.append((code_a, result_a, None))
+                    i += 1
+                elif code_a is None or code_b < code_a:
+                    differences.append((code_b, None, result_b))
+                    j += 1
+                else:
+                    if result_a != result_b:
+                        differences.append((code_a, result_a, result_b))
+                    i += 1
+                    j += 1
+    return differences
+
+
+def print_differences(differences):
+    for code, a, b in differences:
+        print(f"{code_to_text(code)}: {RESULT_CHARACTERS[a] if a is not None else 'missing'} "
+              f"{RESULT_CHARACTERS[b] if b is not None else 'missing'}")
+    print("tables are equal" if not differences else f"{len(differences)} differences")
+
+
+def check_counts(path, counts):
+    # compares the W/D/L counts of the table with counts[player name][status name] (see board_scaling.py),
+    # returns the list of differences
+    found = {p.name: {s.name: 0 for s in Status} for p in Player}
+    with Tablebase(path) as table:
+        for code, result in table.items():
+            player = Player.BLACK if segment_of(code) >> QUEEN_BITS else Player.WHITE
+            found[player.name][result.name] += 1
+    return [f"{p} {s}: expected {n}, found {found[p][s]}" for p, c in counts.items() for s, n in c.items()
+            if found[p][s] != n]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify a tablebase file against the rules of the game")
+    parser.add_argument("table")
+    parser.add_argument("--diff", help="compare with this tablebase file instead")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-failures", type=int, default=100)
+    parser.add_argument("--max-pawns", type=int, help="verify the positions up to this number of pawns, "
+                                                      "by default the most pawns in the table")
+    args = parser.parse_args()
+
+    if args.diff:
+        found = diff(args.table, args.diff, args.processes, args.max_failures)
+        print_differences(found)
+    else:
+        failures, unexpected = verify(args.table, args.processes, args.max_failures, args.max_pawns)
+        found = failures or unexpected
+    sys.exit(1 if found else 0)